@@ -12,7 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import requests
 from helperFunctions import *
 
 
@@ -20,40 +19,24 @@ class SLO:
     def __init__(self, slo_id, SOC):
         self.__slo_id = slo_id
         self.__soc = SOC
-        self.__slo_name = self.__fetchName()
+        self.__slo_name = self.__soc._uniqueName(
+            "signalfx_slo", self.__fetchName(), lambda name: f"{setTfName(name)}.tf")
         self.__tf_item_name = setTfName(self.__slo_name)
-        self.__initialWrite()
+        self.__soc._openOutput(f"{self.__tf_item_name}.tf", [
+                               f"signalfx_slo.{self.__tf_item_name}"])
         self.__importTerraform()
 
     def __importTerraform(self):
-        if not self.__soc._getFuse():
-            terraformInit(self.__soc._getCWD(),
-                          self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
-        terraformImport(f"signalfx_slo.{self.__tf_item_name}", self.__slo_id, self.__soc._getCWD(
-        ), self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
-        self.__terraform = terraformState(f"signalfx_slo.{self.__tf_item_name}", self.__slo_id, self.__soc._getCWD(
-        ), self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
-        if isinstance(self.__terraform, int):
-            return
-        self.__terraform = '\n'.join(line for line in self.__terraform.split(
-            '\n') if not re.search(r'\b(url|id|config_id|tags)\s*=', line))
-        return
+        self.__soc._importResource(
+            f"signalfx_slo.{self.__tf_item_name}", self.__slo_id, self.__loadTerraform, self.__data, {"url", "id", "config_id", "tags"})
 
-    def __initialWrite(self):
-        with open(f"{self.__soc._getCWD()}/{self.__tf_item_name}.tf", "w") as f:
-            f.write(
-                f"resource \"signalfx_slo\" \"{self.__tf_item_name}\" {{\n")
-            f.write(f"}}\n")
+    def __loadTerraform(self, terraform):
+        self.__soc._writeOutput(f"{self.__tf_item_name}.tf", f"signalfx_slo.{self.__tf_item_name}",
+                                self.__slo_id, self.__data, terraform)
+        self.__data = None
+        return
 
     def __fetchName(self):
-        url = f"https://api.{self.__soc._getRealm()}.signalfx.com/v2/slo/{self.__slo_id}"
-        headers = {"X-SF-TOKEN": self.__soc._getAPIKey()}
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        slo_name = response.json()['name']
+        self.__data = self.__soc._apiGet(f"/v2/slo/{self.__slo_id}")
+        slo_name = self.__data['name']
         return slo_name
-
-    def _produceTerraform(self):
-        with open(f"{self.__soc._getCWD()}/{self.__tf_item_name}.tf", "w") as f:
-            f.write(self.__terraform)
-        return
@@ -0,0 +1,119 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import email.utils
+import math
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tracerClass import tracer
+
+# Upper bound of a server's Retry-After, in seconds
+max_retry_after = 60.0
+
+
+class APIClient:
+    # One keep-alive session shared by every resource, with retries and an org-wide request budget
+    def __init__(self, token, realm, max_rps=None, max_retries=5, pool_size=10, base_url=None):
+        self.__base_url = (base_url or f"https://api.{realm}.signalfx.com").rstrip("/")
+        self.__max_retries = max_retries
+        self.__interval = 1.0 / max_rps if max_rps else 0.0
+        self.__next_slot = 0.0
+        self.__lock = threading.Lock()
+        self.__stats = {"requests": 0, "retries": 0, "throttled": 0.0}
+        self.__session = requests.Session()
+        self.__session.headers.update({"X-SF-TOKEN": token})
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        self.__session.mount("https://", adapter)
+        self.__session.mount("http://", adapter)
+
+    def __count(self, stat, value=1):
+        with self.__lock:
+            self.__stats[stat] += value
+
+    def __throttle(self, delay):
+        if delay > 0:
+            self.__count("throttled", delay)
+            time.sleep(delay)
+
+    def __waitForBudget(self):
+        # Space requests evenly so that all threads together stay within max_rps
+        if not self.__interval:
+            return
+        with self.__lock:
+            now = time.monotonic()
+            slot = max(now, self.__next_slot)
+            self.__next_slot = slot + self.__interval
+        self.__throttle(slot - now)
+
+    def __backoff(self, attempt) -> float:
+        return min(60.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def __retryAfter(self, response, attempt) -> float:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            delay = None
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    retry_at = email.utils.parsedate_to_datetime(retry_after)
+                    delay = retry_at.timestamp() - time.time()
+                except (TypeError, ValueError):
+                    # A malformed header falls back to the usual backoff rather than aborting the export
+                    pass
+            # inf and nan fall back too, and no server or proxy can stall the export for longer than a minute
+            if delay != None and math.isfinite(delay):
+                return min(max_retry_after, max(0.0, delay))
+        return self.__backoff(attempt)
+
+    def _get(self, path, params=None):
+        # Traced per resource (/v2/<type>/<id>), retries and throttling included
+        parts = path.strip("/").split("/")
+        with tracer._span(f"GET /{'/'.join(parts[:2])}", "api", type=parts[1] if len(parts) > 1 else None,
+                          id=parts[2] if len(parts) > 2 else None, offset=(params or {}).get("offset")):
+            return self.__request(path, params)
+
+    def __request(self, path, params=None):
+        url = f"{self.__base_url}{path}"
+        for attempt in range(self.__max_retries + 1):
+            self.__waitForBudget()
+            self.__count("requests")
+            try:
+                response = self.__session.get(url, params=params, timeout=60)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.__max_retries:
+                    raise
+                self.__count("retries")
+                time.sleep(self.__backoff(attempt))
+                continue
+            if response.status_code == 429 and attempt < self.__max_retries:
+                self.__count("retries")
+                self.__throttle(self.__retryAfter(response, attempt))
+                continue
+            if response.status_code >= 500 and attempt < self.__max_retries:
+                self.__count("retries")
+                time.sleep(self.__backoff(attempt))
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def _getStats(self) -> dict:
+        with self.__lock:
+            return dict(self.__stats)
@@ -0,0 +1,124 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for the api.<realm>.signalfx.com endpoints used by the exporter:
+#   GET /v2/<type>/<id>                      a single resource
+#   GET /v2/<type>?offset=&limit=&name=&tags= a page of resources
+#   GET /_stats                              requests served so far (not counted)
+
+
+class MockServer:
+    def __init__(self, org, port=0, latency=0.0):
+        self.__org = org
+        self.__latency = latency
+        self.__requests = 0
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(
+            ("127.0.0.1", port), self.__handler())
+        self.__server.daemon_threads = True
+        self.__thread = None
+
+    def __handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                status, body = server._respond(self.path)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def _respond(self, path):
+        url = urlparse(path)
+        parts = [part for part in url.path.split("/") if part]
+        if parts == ["_stats"]:
+            return 200, {"requests": self._getRequests()}
+        with self.__lock:
+            self.__requests += 1
+        if self.__latency:
+            time.sleep(self.__latency)
+        if len(parts) == 2 and parts[0] == "v2":
+            query = parse_qs(url.query)
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query.get("limit", ["50"])[0])
+            results = [resource["data"] for resource in self.__org.values()
+                       if resource["kind"] == parts[1]]
+            if "name" in query:
+                results = [result for result in results if query["name"]
+                           [0].lower() in result["name"].lower()]
+            if "tags" in query:
+                results = [result for result in results if any(
+                    tag in (result.get("tags") or []) for tag in query["tags"])]
+            return 200, {"count": len(results), "results": results[offset:offset + limit]}
+        if len(parts) == 3 and parts[0] == "v2":
+            resource = self.__org.get(parts[2])
+            if resource != None and resource["kind"] == parts[1]:
+                return 200, resource["data"]
+        return 404, {"message": "Not found"}
+
+    def _getPort(self) -> int:
+        return self.__server.server_address[1]
+
+    def _getRequests(self) -> int:
+        with self.__lock:
+            return self.__requests
+
+    def _resetRequests(self) -> None:
+        with self.__lock:
+            self.__requests = 0
+
+    def _start(self) -> None:
+        self.__thread = threading.Thread(
+            target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+
+    def _stop(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Serve a synthetic org as a mock Splunk Observability Cloud API.')
+    parser.add_argument('org', type=str, help='Org JSON file from syntheticOrg.py')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds added to every response')
+    args = parser.parse_args()
+    with open(args.org, "r") as f:
+        server = MockServer(json.load(f), args.port, args.latency)
+    print(f"Serving on http://127.0.0.1:{server._getPort()}")
+    server._start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server._stop()
@@ -0,0 +1,222 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import os
+import shlex
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from mockServer import MockServer
+from syntheticOrg import buildOrg
+
+# Runs the exporter against the mock API server and the fake terraform binary, and
+# reports wall time, HTTP calls, terraform launches, bytes written and peak RSS.
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+repository_dir = os.path.dirname(benchmarks_dir)
+
+sizes = {
+    # groups, dashboards per group, charts per dashboard
+    "small": (1, 5, 10),
+    "medium": (1, 20, 20),
+    "large": (1, 50, 30),
+}
+
+scenarios = {
+    # Export flag, the synthetic id it is run against and any arguments of its own
+    "group": ("--group", "G00000", []),
+    "dashboard": ("--dashboard", "D0000000000", []),
+    "chart": ("--chart", "C00000000000000", []),
+    "detector": ("--detector", "DT00000", []),
+    "slo": ("--slo", "SL00000", []),
+    # Cold start: a single resource rendered without Terraform, into an empty output directory
+    "startup": ("--chart", "C00000000000000", ["--backend", "native"]),
+}
+
+# Counters must not grow at all, timings and memory within the tolerance
+exact_metrics = ["http_calls", "terraform_launches"]
+timed_metrics = ["wall_seconds", "peak_rss_mb", "bytes_written"]
+
+
+def outputBytes(output_dir) -> int:
+    return sum(os.path.getsize(os.path.join(output_dir, filename)) for filename in os.listdir(output_dir)
+               if filename.endswith(".tf") and filename != "main.tf")
+
+
+def runExport(server, org_file, scenario, extra_args, tf_latency) -> dict:
+    workspace = tempfile.mkdtemp(prefix="stt-bench-")
+    try:
+        output_dir = os.path.join(workspace, "terraform_output")
+        # main.tf is copied in by the exporter itself, as part of its startup
+        os.makedirs(output_dir)
+        tf_log = os.path.join(workspace, "terraform.log")
+        env = dict(os.environ)
+        env.update({
+            "PATH": os.path.join(benchmarks_dir, "bin") + os.pathsep + env.get("PATH", ""),
+            "BENCH_ORG": org_file,
+            "BENCH_TF_LOG": tf_log,
+            "BENCH_TF_LATENCY": str(tf_latency),
+        })
+        flag, resource_id, scenario_args = scenarios[scenario]
+        command = [sys.executable, os.path.join(repository_dir, "init.py"), "-a", "benchmark", "-r", "us1",
+                   "--api-url", f"http://127.0.0.1:{server._getPort()}", "--no-cache", "--plugin-cache", "",
+                   flag, resource_id] + scenario_args + extra_args
+        server._resetRequests()
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=workspace, env=env, stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+        stderr = process.stderr.read().decode()
+        process.stderr.close()
+        if os.waitstatus_to_exitcode(status) != 0:
+            raise RuntimeError(f"{scenario} export failed:\n{stderr}")
+        try:
+            with open(tf_log, "r") as f:
+                launches = len(f.readlines())
+        except FileNotFoundError:
+            launches = 0
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        rss = usage.ru_maxrss / (1024 * 1024 if sys.platform ==
+                                 "darwin" else 1024)
+        return {
+            "wall_seconds": round(wall, 3),
+            "http_calls": server._getRequests(),
+            "terraform_launches": launches,
+            "bytes_written": outputBytes(output_dir),
+            "peak_rss_mb": round(rss, 1),
+        }
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def compare(name, result, baseline, tolerance) -> list:
+    regressions = []
+    for metric in exact_metrics:
+        if metric in baseline and result[metric] > baseline[metric]:
+            regressions.append(
+                f"{name}: {metric} {baseline[metric]} -> {result[metric]}")
+    for metric in timed_metrics:
+        if metric in baseline and result[metric] > baseline[metric] * (1 + tolerance):
+            regressions.append(
+                f"{name}: {metric} {baseline[metric]} -> {result[metric]}")
+    return regressions
+
+
+def formatChange(value, baseline) -> str:
+    if baseline == None:
+        return str(value)
+    if baseline == 0:
+        return f"{value} (was 0)"
+    return f"{value} ({(value - baseline) / baseline:+.0%})"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark exports against a mock Splunk Observability Cloud API and a fake terraform binary.')
+    parser.add_argument('--size', type=str, choices=list(sizes), default='small',
+                        help='Synthetic org size preset')
+    parser.add_argument('--groups', type=int, default=None)
+    parser.add_argument('--dashboards', type=int, default=None,
+                        help='Dashboards per group')
+    parser.add_argument('--charts', type=int, default=None,
+                        help='Charts per dashboard')
+    parser.add_argument('--scenario', type=str, action='append', choices=list(scenarios),
+                        help='Export to benchmark, may be repeated (default: all)')
+    parser.add_argument('--args', type=str, default='',
+                        help='Extra exporter arguments, e.g. "--backend native" or "--jobs 4"')
+    parser.add_argument('--api-latency', type=float, default=0.0,
+                        help='Seconds added to every mock API response')
+    parser.add_argument('--tf-latency', type=float, default=0.0,
+                        help='Seconds added to every fake terraform launch')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Runs per scenario, the median wall time is reported')
+    parser.add_argument('--baselines', type=str, default=os.path.join(benchmarks_dir, 'baselines.json'),
+                        help='Baselines file')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store the results as the new baselines')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative growth of wall time, peak RSS and bytes written')
+    parser.add_argument('--check', action='store_true',
+                        help='Exit with an error if any metric regressed against its baseline')
+    args = parser.parse_args()
+
+    groups, dashboards, charts = sizes[args.size]
+    groups = args.groups or groups
+    dashboards = args.dashboards or dashboards
+    charts = args.charts or charts
+    org = buildOrg(groups, dashboards, charts, detectors=1, slos=1)
+    size = f"{groups}x{dashboards}x{charts}"
+    extra_args = shlex.split(args.args)
+
+    try:
+        with open(args.baselines, "r") as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {}
+
+    workspace = tempfile.mkdtemp(prefix="stt-bench-org-")
+    org_file = os.path.join(workspace, "org.json")
+    with open(org_file, "w") as f:
+        json.dump(org, f)
+    server = MockServer(org, latency=args.api_latency)
+    server._start()
+    results = {}
+    regressions = []
+    try:
+        print(f"Org {size} (groups x dashboards x charts), {len(org)} resources, args: {args.args or '-'}")
+        print(f"{'scenario':<10} {'wall s':>16} {'http':>12} {'terraform':>12} {'bytes':>18} {'rss MB':>16}")
+        for scenario in args.scenario or list(scenarios):
+            runs = [runExport(server, org_file, scenario, extra_args, args.tf_latency)
+                    for _ in range(max(1, args.repeat))]
+            result = dict(runs[0])
+            result["wall_seconds"] = round(statistics.median(
+                run["wall_seconds"] for run in runs), 3)
+            result["peak_rss_mb"] = max(run["peak_rss_mb"] for run in runs)
+            name = f"{size}/{scenario}/{args.args}"
+            results[name] = result
+            baseline = baselines.get(name, {})
+            print(f"{scenario:<10} {formatChange(result['wall_seconds'], baseline.get('wall_seconds')):>16}"
+                  f" {formatChange(result['http_calls'], baseline.get('http_calls')):>12}"
+                  f" {formatChange(result['terraform_launches'], baseline.get('terraform_launches')):>12}"
+                  f" {formatChange(result['bytes_written'], baseline.get('bytes_written')):>18}"
+                  f" {formatChange(result['peak_rss_mb'], baseline.get('peak_rss_mb')):>16}")
+            regressions.extend(
+                compare(name, result, baseline, args.tolerance))
+    finally:
+        server._stop()
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baselines, "w") as f:
+            json.dump(dict(sorted(baselines.items())), f, indent=2)
+            f.write("\n")
+        print(f"Baselines saved to {args.baselines}")
+    if regressions:
+        print("Regressions against the baselines:")
+        for regression in regressions:
+            print(f"  {regression}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
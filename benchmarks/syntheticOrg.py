@@ -0,0 +1,118 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+
+# Synthetic Splunk Observability Cloud org, shaped like the /v2 API responses.
+# Every resource is stored as {"kind": <API resource type>, "data": <API response>}.
+
+chart_types = ["TimeSeriesChart", "SingleValue", "List",
+               "Text", "TableChart", "Heatmap", "Event"]
+
+last_updated = 1700000000000
+
+
+def chartData(chart_id, index):
+    chart_type = chart_types[index % len(chart_types)]
+    options = {"type": chart_type}
+    if chart_type == "Text":
+        options["markdown"] = f"# Notes {index}\nGenerated for benchmarking\n"
+    else:
+        options.update({
+            "unitPrefix": "Metric",
+            "colorBy": "Dimension",
+            "publishLabelOptions": [{"label": "A", "displayName": "CPU", "paletteIndex": index % 16, "yAxis": 0}],
+            "programOptions": {"minimumResolution": 0, "maxDelay": 0, "disableSampling": False},
+            "time": {"type": "relative", "range": 3600000},
+        })
+    return {
+        "id": chart_id,
+        "name": f"Chart {index}",
+        "description": "",
+        "programText": None if chart_type == "Text" else f"A = data('cpu.utilization', filter=filter('host', 'h{index}')).mean().publish(label='A')",
+        "options": options,
+        "tags": [],
+        "lastUpdated": last_updated,
+    }
+
+
+def buildOrg(groups=1, dashboards=50, charts=30, detectors=0, slos=0, shared=True):
+    org = {}
+    for g in range(groups):
+        group_id = f"G{g:05d}"
+        dashboard_ids = []
+        first_chart = None
+        for d in range(dashboards):
+            dashboard_id = f"D{g:05d}{d:05d}"
+            dashboard_ids.append(dashboard_id)
+            layout = []
+            for c in range(charts):
+                chart_id = f"C{g:05d}{d:05d}{c:04d}"
+                org[chart_id] = {"kind": "chart",
+                                 "data": chartData(chart_id, c)}
+                layout.append({"chartId": chart_id, "row": c // 2,
+                              "column": (c % 2) * 6, "width": 6, "height": 1})
+            if shared and first_chart != None:
+                # One chart shared by every dashboard of the group
+                layout.append({"chartId": first_chart, "row": charts,
+                              "column": 0, "width": 6, "height": 1})
+            if layout and first_chart == None:
+                first_chart = layout[0]["chartId"]
+            org[dashboard_id] = {"kind": "dashboard", "data": {
+                "id": dashboard_id, "name": f"Dashboard {d}", "description": "", "groupId": group_id,
+                "chartDensity": "DEFAULT", "charts": layout,
+                "filters": {"variables": [], "time": {"start": "-1h", "end": "Now"}},
+                "lastUpdated": last_updated,
+            }}
+        org[group_id] = {"kind": "dashboardgroup", "data": {
+            "id": group_id, "name": f"Group {g}", "description": "", "dashboards": dashboard_ids,
+            "teams": [], "lastUpdated": last_updated,
+        }}
+    for i in range(detectors):
+        detector_id = f"DT{i:05d}"
+        org[detector_id] = {"kind": "detector", "data": {
+            "id": detector_id, "name": f"Detector {i}", "description": "",
+            "programText": "A = data('cpu.utilization').mean().publish(label='A')\ndetect(when(A > 90)).publish('CPU high')",
+            "tags": [], "maxDelay": 0,
+            "rules": [{"detectLabel": "CPU high", "severity": "Critical", "description": "",
+                       "disabled": False, "notifications": [{"type": "Email", "email": "ops@example.com"}]}],
+            "visualizationOptions": {"time": {"type": "relative", "range": 3600000}},
+            "lastUpdated": last_updated,
+        }}
+    for i in range(slos):
+        slo_id = f"SL{i:05d}"
+        org[slo_id] = {"kind": "slo", "data": {
+            "id": slo_id, "name": f"SLO {i}", "description": "", "type": "RequestBased",
+            "inputs": {"programText": "G = data('good').publish(label='G')\nT = data('total').publish(label='T')",
+                       "goodEventsLabel": "G", "totalEventsLabel": "T"},
+            "targets": [{"type": "RollingWindow", "slo": 99.9, "compliancePeriod": "30d", "sloAlertRules": []}],
+            "lastUpdated": last_updated,
+        }}
+    return org
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Write a synthetic org for the mock API server.')
+    parser.add_argument('output', type=str, help='Output JSON file')
+    parser.add_argument('--groups', type=int, default=1)
+    parser.add_argument('--dashboards', type=int, default=50)
+    parser.add_argument('--charts', type=int, default=30)
+    parser.add_argument('--detectors', type=int, default=0)
+    parser.add_argument('--slos', type=int, default=0)
+    args = parser.parse_args()
+    with open(args.output, "w") as f:
+        json.dump(buildOrg(args.groups, args.dashboards,
+                  args.charts, args.detectors, args.slos), f)
@@ -0,0 +1,91 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import re
+import shutil
+import threading
+
+from helperFunctions import *
+from hclRenderer import renderState, stateResources
+
+
+class BulkImport:
+    # Collects every resource of a run and imports them all with a single
+    # `terraform plan -generate-config-out` over `import {}` blocks
+    def __init__(self, SOC):
+        self.__soc = SOC
+        self.__workspace = os.path.join(self.__soc._getCWD(), ".bulk")
+        self.__imports = {}
+        self.__lock = threading.Lock()
+
+    def _register(self, resource_address, resource_id, callback, exclude=()):
+        with self.__lock:
+            if resource_address not in self.__imports:
+                self.__imports[resource_address] = (resource_id, exclude, [])
+            self.__imports[resource_address][2].append(callback)
+
+    def __writeImports(self):
+        # Providers are only downloaded once, into the output directory
+        terraformInit(self.__soc._getCWD(),
+                      self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
+        linkWorkspace(self.__soc._getCWD(), self.__workspace)
+        with open(os.path.join(self.__workspace, "imports.tf"), "w") as f:
+            for resource_address, (resource_id, _, _) in self.__imports.items():
+                f.write(f"import {{\n")
+                f.write(f"    to = {resource_address}\n")
+                f.write(f"    id = \"{resource_id}\"\n")
+                f.write(f"}}\n")
+
+    def _run(self):
+        with self.__lock:
+            if not self.__imports:
+                return
+            self.__writeImports()
+            terraformGenerateConfig(self.__workspace, "generated.tf",
+                                    self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose(), "tfplan")
+            # The saved plan holds every imported resource's values, but is only written
+            # when the plan succeeds, otherwise fall back to the generated configuration
+            resources = {}
+            if os.path.exists(os.path.join(self.__workspace, "tfplan")):
+                resources = stateResources(terraformShow(
+                    self.__workspace, "tfplan", self.__soc._getVerbose()))
+            try:
+                with open(os.path.join(self.__workspace, "generated.tf"), "r") as f:
+                    generated = splitResources(f.read())
+            except FileNotFoundError:
+                generated = {}
+            imports = self.__imports
+            self.__imports = {}
+        for resource_address, (resource_id, exclude, callbacks) in imports.items():
+            if resource_address in resources:
+                with tracer._span("renderState", "postprocess", type=resource_address.split(".")[0], id=resource_id):
+                    terraform = renderState(
+                        resource_address, resources[resource_address], exclude, self.__soc._getFormat())
+            elif resource_address in generated and self.__soc._getFormat() == "hcl":
+                # Drop unset optional attributes and mirror the `terraform state show` header
+                with tracer._span("dropAttributes", "postprocess", type=resource_address.split(".")[0], id=resource_id):
+                    block = re.sub(r'\n\s*[\w-]+\s*=\s*null(?=\n)',
+                                   '', generated[resource_address])
+                    terraform = dropAttributes(
+                        f"# {resource_address}:\n{block}\n", exclude)
+            else:
+                if self.__soc._getVerbose():
+                    # JSON output is rendered from the saved plan, which is missing when the plan failed
+                    print(
+                        f"No configuration was generated for {resource_address} ({resource_id})")
+                terraform = ""
+            for callback in callbacks:
+                callback(terraform)
+        shutil.rmtree(self.__workspace, ignore_errors=True)
@@ -12,7 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import requests
 from helperFunctions import *
 
 
@@ -25,42 +24,31 @@ class Chart:
         self.__tf_item_name = setTfName(self.__chart_id)
         self.__parent = parent
         if self.__tf_item_type != None:
-            self.__initialWrite()
+            if self.__parent == None:
+                self.__soc._openOutput(self.__outputFile(), [
+                                       self._getAddress()])
             self.__importTerraform()
 
     def __determineChartType(self):
-        url = f"https://api.{self.__soc._getRealm()}.signalfx.com/v2/chart/{self.__chart_id}"
-        headers = {"X-SF-TOKEN": self.__soc._getAPIKey()}
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        chart_type = response.json()['options']['type']
+        self.__data = self.__soc._apiGet(f"/v2/chart/{self.__chart_id}")
+        chart_type = self.__data['options']['type']
         return chart_type
 
     def __importTerraform(self):
-        if not self.__soc._getFuse():
-            terraformInit(self.__soc._getCWD(),
-                          self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
-        terraformImport(f"{self.__tf_item_type}.{self.__tf_item_name}", self.__chart_id, self.__soc._getCWD(
-        ), self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
-        self.__terraform = terraformState(f"{self.__tf_item_type}.{self.__tf_item_name}", self.__chart_id, self.__soc._getCWD(
-        ), self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
-        if isinstance(self.__terraform, int):
-            return
-        self.__terraform = '\n'.join(line for line in self.__terraform.split(
-            '\n') if not re.search(r'\b(url|id|config_id|tags)\s*=', line))
+        self.__soc._importResource(
+            self._getAddress(), self.__chart_id, self.__loadTerraform, self.__data, {"url", "id", "config_id", "tags"})
+
+    def __loadTerraform(self, terraform):
+        self.__soc._writeOutput(self.__outputFile(), self._getAddress(),
+                                self.__chart_id, self.__data, terraform)
+        # Only the small reference record stays in memory once written
+        self.__data = None
         return
 
-    def __initialWrite(self):
+    def __outputFile(self) -> str:
         if self.__parent == None:
-            with open(f"{self.__soc._getCWD()}/{self.__tf_item_name}.tf", "w") as f:
-                f.write(
-                    f"resource \"{self.__tf_item_type}\" \"{self.__tf_item_name}\" {{\n")
-                f.write(f"}}\n")
-        else:
-            with open(f"{self.__soc._getCWD()}/{self.__parent._getDashboardName()[0]}.tf", "a") as f:
-                f.write(
-                    f"resource \"{self.__tf_item_type}\" \"{self.__tf_item_name}\" {{\n")
-                f.write(f"}}\n")
+            return f"{self.__tf_item_name}.tf"
+        return f"{self.__parent._getDashboardName()[0]}.tf"
 
     def __setChartType(self):
         try:
@@ -75,10 +63,11 @@ class Chart:
     def _getTfItemType(self):
         return self.__tf_item_type
 
-    def _getTerraform(self) -> str:
-        return self.__terraform
+    def _getTfItemName(self):
+        return self.__tf_item_name
 
-    def _produceFile(self):
-        with open(f"{self.__soc._getCWD()}/{self.__tf_item_name}.tf", "w") as f:
-            f.write(self.__terraform)
-        return
+    def _getAddress(self) -> str:
+        return f"{self.__tf_item_type}.{self.__tf_item_name}"
+
+    def _getParent(self):
+        return self.__parent
@@ -12,8 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import hcl
-import requests
+from concurrent.futures import ThreadPoolExecutor
 
 from chartClass import *
 
@@ -22,68 +21,94 @@ class Dashboard:
     def __init__(self, dashboard_id, SOC, dashboard_group=None):
         self.__dashboard_id = dashboard_id
         self.__soc = SOC
-        self.__dashboard_name = self.__fetchName()
+        self.__dashboard_name = self.__soc._uniqueName(
+            "signalfx_dashboard", self.__fetchName(), lambda name: f"{name}.tf")
         self.__tf_item_name = setTfName(self.__dashboard_name)
         self.__charts = []
+        self.__terraform = None
+        self.__chart_addresses = None
         self.__dashboard_group = dashboard_group
         if self.__dashboard_group != None:
-            self.__initialWrite()
-            self.__importTerraform()
             self.__sortCharts()
-
-    def __initialWrite(self):
-        with open(f"{self.__soc._getCWD()}/{self.__dashboard_name}.tf", "w") as f:
-            f.write(
-                f"resource \"signalfx_dashboard\" \"{self.__tf_item_name}\" {{\n")
-            f.write(f"}}\n")
+            self.__importTerraform()
 
     def __importTerraform(self):
-        if not self.__soc._getFuse():
-            terraformInit(self.__soc._getCWD(),
-                          self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
-        terraformImport(f"signalfx_dashboard.{self.__tf_item_name}", self.__dashboard_id, self.__soc._getCWD(
-        ), self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
-        self.__terraform = terraformState(f"signalfx_dashboard.{self.__tf_item_name}", self.__dashboard_id, self.__soc._getCWD(
-        ), self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
+        # The charts are known by now, so an incremental run only reuses the dashboard's code
+        # if its group and charts are still the resources it references
+        references = list(self.__chart_addresses.values())
+        if self.__dashboard_group.startswith("signalfx_"):
+            references.append(self.__dashboard_group.removesuffix(".id"))
+        self.__soc._importResource(
+            f"signalfx_dashboard.{self.__tf_item_name}", self.__dashboard_id, self.__loadTerraform, self.__data, {"url", "id", "config_id"}, references)
+
+    def __loadTerraform(self, terraform):
+        self.__terraform = terraform
         if isinstance(self.__terraform, int):
             return
         if self.__dashboard_group:
-            self.__terraform = re.sub(r'\b(dashboard_group)\s*=\s*".*"',
-                                      r'\1 = {}'.format(self.__dashboard_group), self.__terraform)
+            self.__terraform = setReference(
+                self.__terraform, "dashboard_group", self.__dashboard_group)
         if self.__dashboard_group != "PLACEHOLDER":
-            self.__terraform = re.sub(
-                r'\b(parent)\s*=\s*".*"', r'\1 = {}'.format(self.__dashboard_group), self.__terraform)
-        self.__terraform = '\n'.join(line for line in self.__terraform.split(
-            '\n') if not re.search(r'\b(url|id|config_id)\s*=', line))
-
+            self.__terraform = setReference(
+                self.__terraform, "parent", self.__dashboard_group)
+        self.__writeOutput()
         return
 
+    def __writeOutput(self):
+        # Written once both the dashboard's own code and its charts are known, with the
+        # chart ids already pointing at the chart resources
+        if self.__terraform == None or self.__chart_addresses == None:
+            return
+        with tracer._span("resolveChartReferences", "postprocess", type="signalfx_dashboard", id=self.__dashboard_id):
+            terraform = resolveChartReferences(
+                self.__terraform, self.__chart_addresses, set())
+        self.__soc._writeOutput(f"{self.__dashboard_name}.tf", f"signalfx_dashboard.{self.__tf_item_name}", self.__dashboard_id,
+                                self.__data, terraform)
+        # Only the small reference record stays in memory once written
+        self.__terraform = ""
+        self.__data = None
+
     def __fetchName(self) -> str:
-        url = f"https://api.{self.__soc._getRealm()}.signalfx.com/v2/dashboard/{self.__dashboard_id}"
-        headers = {"X-SF-TOKEN": self.__soc._getAPIKey()}
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()["name"]
+        self.__data = self.__soc._apiGet(f"/v2/dashboard/{self.__dashboard_id}")
+        return self.__data["name"]
 
-    def _getTerraform(self) -> str:
-        return self.__terraform
+    def __chartIds(self) -> list:
+        # Imports are deferred, so the charts come from the dashboard's API response
+        return [chart["chartId"] for chart in self.__data.get("charts") or []]
 
-    def __sortCharts(self):
-        parsed_config = hcl.loads(self.__terraform)
-        if 'chart' not in parsed_config['resource']['signalfx_dashboard'][self.__tf_item_name]:
-            return
-        # Extract the charts
-        charts = parsed_config['resource']['signalfx_dashboard'][self.__tf_item_name]['chart']
+    def _getChartPaths(self) -> list:
+        return [f"/v2/chart/{chart['chartId']}" for chart in self.__data.get("charts") or []]
 
-        # if chart is not an array, make it an array of one object
-        if not isinstance(charts, list):
-            charts = [charts]
+    def _claimCharts(self) -> None:
+        # A chart shared by several dashboards is written to the file of the first one to claim it,
+        # as is the first of a set of identical charts with --dedupe-charts
+        for chart_id in self.__chartIds():
+            self.__soc._claim(
+                "chart", self.__soc._canonicalChart(chart_id), self)
 
-        for chart in charts:
-            # Create a new Chart object and append it to self.__charts
-            new_chart = Chart(self.__soc, chart["chart_id"], self)
+    def __sortCharts(self):
+        self.__charts = []
+        # The chart list comes from the dashboard response fetched for its name, no state is parsed
+        chart_ids = self.__chartIds()
+        # Chart metadata is fetched concurrently up front rather than by each Chart in turn
+        self.__soc._prefetch(
+            [f"/v2/chart/{chart_id}" for chart_id in chart_ids])
+        self._claimCharts()
+        canonical_ids = {chart_id: self.__soc._canonicalChart(
+            chart_id) for chart_id in chart_ids}
+        # Create the Chart objects (imported concurrently when running with --jobs),
+        # reusing the one already imported for a chart that is shared with another dashboard
+        with ThreadPoolExecutor(max_workers=self.__soc._getJobs()) as executor:
+            built = dict(zip(dict.fromkeys(canonical_ids.values()), executor.map(lambda chart_id: self.__soc._getResource(
+                "chart", chart_id, lambda: Chart(self.__soc, chart_id, self.__soc._claim("chart", chart_id, self))), dict.fromkeys(canonical_ids.values()))))
+        for new_chart in built.values():
             if new_chart._getTfItemType() != None:
                 self.__charts.append(new_chart)
+        self.__soc._openOutput(f"{self.__dashboard_name}.tf", [f"signalfx_dashboard.{self.__tf_item_name}"] + list(dict.fromkeys(
+            chart._getAddress() for chart in self.__charts if chart._getParent() is self)))
+        self.__chart_addresses = {chart_id: built[canonical_id]._getAddress() for chart_id, canonical_id in canonical_ids.items()
+                                  if built[canonical_id]._getTfItemType() != None}
+        self.__writeOutput()
 
     def _getDashboardName(self) -> str:
         return [self.__dashboard_name, self.__tf_item_name]
@@ -91,29 +116,8 @@ class Dashboard:
     def _getName(self) -> str:
         return self.__dashboard_name
 
-    def _setName(self, name) -> None:
-        self.__dashboard_name = name
-        self.__tf_item_name = setTfName(self.__dashboard_name)
-        self.__initialWrite()
-        self.__importTerraform()
-        self.__sortCharts()
-        return
-
     def _setGroup(self, group) -> None:
         self.__dashboard_group = group
-        self.__initialWrite()
-        self.__importTerraform()
         self.__sortCharts()
-        return
-
-    def _produceFile(self):
-        with open(f"{self.__soc._getCWD()}/{self.__dashboard_name}.tf", "w") as f:
-            f.write(self.__terraform)
-            for chart in self.__charts:
-                if chart._getTerraform() != 1:
-                    terraform_string = str(chart._getTerraform())
-                    f.write(terraform_string)
-                    f.write("\n")
-                    f.write(terraform_string.split('\n')[0])
-                    f.write("\n")
+        self.__importTerraform()
         return
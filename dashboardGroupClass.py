@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent.futures import ThreadPoolExecutor
+
 from dashboardClass import *
 
 
@@ -20,64 +22,49 @@ class DashboardGroup:
         self.__group_id = group_id
         self.__soc = SOC
         self.__dashboards = []
-        self.__group_name = self.__fetchName()
+        self.__group_name = self.__soc._uniqueName(
+            "signalfx_dashboard_group", self.__fetchName(), lambda name: f"{name}-Group.tf")
         self.__tf_item_name = setTfName(self.__group_name)
-        self.__initialWrite()
+        self.__soc._openOutput(f"{self.__group_name}-Group.tf", [
+                               f"signalfx_dashboard_group.{self.__tf_item_name}"])
         self.__importTerraform()
         self.__fetchChildDashboards()
-        self.__checkDuplicateChildren()
+        self.__importChildDashboards()
 
     def __fetchName(self) -> str:
-        url = f"https://api.{self.__soc._getRealm()}.signalfx.com/v2/dashboardgroup/{self.__group_id}"
-        headers = {"X-SF-TOKEN": self.__soc._getAPIKey()}
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()["name"]
+        self.__data = self.__soc._apiGet(f"/v2/dashboardgroup/{self.__group_id}")
+        # Kept apart from the response, which is released once the group is written
+        self.__dashboard_ids = self.__data.get('dashboards') or []
+        return self.__data["name"]
 
     def __fetchChildDashboards(self):
-        group_id = f"signalfx_dashboard_group.{self.__tf_item_name}.id"
-        url = f"https://api.{self.__soc._getRealm()}.signalfx.com/v2/dashboardgroup/{self.__group_id}"
-        headers = {"X-SF-TOKEN": self.__soc._getAPIKey()}
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        for dashboard in data.get('dashboards'):
-            new_dashboard = Dashboard(dashboard, self.__soc, group_id)
+        # The group was already fetched for its name, so the dashboard list comes from that response
+        self.__soc._prefetch(
+            [f"/v2/dashboard/{dashboard}" for dashboard in self.__dashboard_ids])
+        for dashboard in self.__dashboard_ids:
+            new_dashboard = Dashboard(dashboard, self.__soc)
             self.__dashboards.append(new_dashboard)
+        # Fetch the metadata for every chart in the group in one concurrent batch
+        self.__soc._prefetch(
+            [path for dashboard in self.__dashboards for path in dashboard._getChartPaths()])
         return
 
-    def __initialWrite(self):
-        with open(f"{self.__soc._getCWD()}/{self.__group_name}-Group.tf", "w") as f:
-            f.write(
-                f"resource \"signalfx_dashboard_group\" \"{self.__tf_item_name}\" {{\n")
-            f.write(f"}}\n")
-
-    def __importTerraform(self):
-        if not self.__soc._getFuse():
-            terraformInit(self.__soc._getCWD(),
-                          self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
-        terraformImport(f"signalfx_dashboard_group.{self.__tf_item_name}", self.__group_id, self.__soc._getCWD(
-        ), self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
-        self.__terraform = terraformState(f"signalfx_dashboard_group.{self.__tf_item_name}", self.__group_id, self.__soc._getCWD(
-        ), self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
-        self.__terraform = '\n'.join(line for line in self.__terraform.split(
-            '\n') if not re.search(r'\b(url|id|config_id)\s*=', line))
+    def __importChildDashboards(self):
+        group_id = f"signalfx_dashboard_group.{self.__tf_item_name}.id"
+        # Shared charts go to the first dashboard in the group's order, whichever is imported first
+        for dashboard in self.__dashboards:
+            dashboard._claimCharts()
+        with ThreadPoolExecutor(max_workers=self.__soc._getJobs()) as executor:
+            list(executor.map(lambda dashboard: dashboard._setGroup(
+                group_id), self.__dashboards))
         return
 
-    def __checkDuplicateChildren(self):
-        name_count = {}
-        for dashboard in self.__dashboards:
-            name = dashboard._getName()
-            if name in name_count:
-                name_count[name] += 1
-                new_name = f"{name}{name_count[name]}"
-                dashboard._setName(new_name)
-            else:
-                name_count[name] = 0
+    def __importTerraform(self):
+        self.__soc._importResource(
+            f"signalfx_dashboard_group.{self.__tf_item_name}", self.__group_id, self.__loadTerraform, self.__data, {"url", "id", "config_id"})
 
-    def _produceFile(self):
-        with open(f"{self.__soc._getCWD()}/{self.__group_name}-Group.tf", "w") as f:
-            f.write(self.__terraform)
-        for dashboard in self.__dashboards:
-            dashboard._produceFile()
+    def __loadTerraform(self, terraform):
+        self.__soc._writeOutput(f"{self.__group_name}-Group.tf", f"signalfx_dashboard_group.{self.__tf_item_name}",
+                                self.__group_id, self.__data, terraform)
+        self.__data = None
         return
@@ -0,0 +1,236 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hmac
+import io
+import json
+import re
+import tarfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from dashboardGroupClass import *
+from SLOClass import *
+from detectorClass import *
+from splunkCloud import *
+
+# Local HTTP/JSON API for --serve:
+#   POST /export   {"type": "dashboardgroup", "id": "...", "format": "hcl", "archive": false}
+#                  returns {"files": {"<name>.tf": "..."}, "incomplete": [...]}, or a .tar.gz with "archive"
+#   GET  /health   {"status": "ok", "running": n, "queued": n}
+# With a token, every request must send "Authorization: Bearer <token>"
+
+export_types = ["dashboardgroup", "dashboard", "chart", "detector", "slo"]
+# Export requests are a few short fields
+max_body = 64 * 1024
+
+
+class ExportServer:
+    # Long-running exporter. The API session and the providers initialised in cwd are shared by
+    # every request, each export runs in a scratch workspace of its own. There is no response cache,
+    # a daemon running for days would otherwise keep exporting stale definitions.
+    # At most `workers` exports run at once, further requests wait in the executor's queue
+    def __init__(self, token, realm, cwd, host="127.0.0.1", port=8080, workers=2, verbose=False, jobs=1, backend="import", max_rps=None, concurrency=8, api_url=None, output_format="hcl", dedupe_charts=False, serve_token=None):
+        self.__token = token
+        self.__realm = realm
+        self.__cwd = cwd
+        self.__root = os.path.join(cwd, ".serve")
+        self.__workers = max(1, workers)
+        self.__verbose = verbose
+        self.__jobs = max(1, jobs)
+        self.__backend = backend
+        self.__max_rps = max_rps
+        self.__concurrency = max(1, concurrency)
+        self.__api_url = api_url
+        self.__format = output_format
+        self.__dedupe = dedupe_charts
+        self.__serve_token = serve_token
+        self.__running = 0
+        self.__queued = 0
+        self.__lock = threading.Lock()
+        self.__client = APIClient(token, realm, max_rps, base_url=api_url,
+                                  pool_size=max(10, self.__jobs * 2, self.__concurrency) * self.__workers)
+        self.__executor = ThreadPoolExecutor(max_workers=self.__workers)
+        self.__server = ThreadingHTTPServer((host, port), self.__handler())
+        self.__server.daemon_threads = True
+
+    def __handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                if server._getVerbose():
+                    super().log_message(format, *args)
+
+            def do_GET(self):
+                if not server._authorized(self.headers.get("Authorization")):
+                    return self.__reply(401, {"error": "Unauthorized"})
+                if self.path.split("?")[0] != "/health":
+                    return self.__reply(404, {"error": "Not found"})
+                self.__reply(200, server._health())
+
+            def do_POST(self):
+                if not server._authorized(self.headers.get("Authorization")):
+                    # The body is left unread, so the connection cannot be reused
+                    self.close_connection = True
+                    return self.__reply(401, {"error": "Unauthorized"})
+                if self.path.split("?")[0] != "/export":
+                    return self.__reply(404, {"error": "Not found"})
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0 or length > max_body:
+                    # The body is left unread, so the connection cannot be reused
+                    self.close_connection = True
+                    return self.__reply(413 if length > max_body else 400, {"error": f"The request body must be a JSON object of at most {max_body} bytes"})
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    return self.__reply(400, {"error": "The request body must be a JSON object"})
+                if not isinstance(request, dict):
+                    return self.__reply(400, {"error": "The request body must be a JSON object"})
+                status, body = server._submit(request)
+                if isinstance(body, bytes):
+                    return self.__reply(status, body, "application/gzip")
+                self.__reply(status, body)
+
+            def __reply(self, status, body, content_type="application/json"):
+                payload = body if isinstance(body, bytes) else json.dumps(
+                    body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def _getVerbose(self) -> bool:
+        return self.__verbose
+
+    def _authorized(self, authorization) -> bool:
+        # Exports run with the operator's API token, so callers must present the shared secret
+        if self.__serve_token == None:
+            return True
+        scheme, _, token = (authorization or "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), self.__serve_token.encode())
+
+    def _getAddress(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _health(self) -> dict:
+        with self.__lock:
+            return {"status": "ok", "running": self.__running, "queued": self.__queued}
+
+    def _submit(self, request):
+        # Validate an export request, then wait for a worker to run it
+        kind = request.get("type")
+        resource_id = request.get("id")
+        output_format = request.get("format") or self.__format
+        if kind not in export_types:
+            return 400, {"error": f"type must be one of: {', '.join(export_types)}"}
+        if not isinstance(resource_id, str) or not re.fullmatch(r'[\w-]+', resource_id):
+            return 400, {"error": "id must be a resource id"}
+        if output_format not in ["hcl", "json"]:
+            return 400, {"error": "format must be hcl or json"}
+        with self.__lock:
+            self.__queued += 1
+        future = self.__executor.submit(
+            self.__export, kind, resource_id, output_format)
+        try:
+            files, incomplete = future.result()
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response != None else 502
+            return (404 if status == 404 else 502), {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": str(e)}
+        if request.get("archive"):
+            return 200, self.__archive(files)
+        return 200, {"files": files, "incomplete": incomplete}
+
+    def __archive(self, files) -> bytes:
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for filename, content in files.items():
+                data = content.encode()
+                info = tarfile.TarInfo(filename)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        return buffer.getvalue()
+
+    def __build(self, soc, kind, resource_id) -> None:
+        if kind == "dashboard":
+            dashboard = Dashboard(resource_id, soc)
+            dashboard._setGroup("PLACEHOLDER")
+        elif kind == "dashboardgroup":
+            DashboardGroup(resource_id, soc)
+        elif kind == "chart":
+            Chart(soc, resource_id, None)
+        elif kind == "slo":
+            SLO(resource_id, soc)
+        elif kind == "detector":
+            Detector(soc, resource_id)
+
+    def __export(self, kind, resource_id, output_format):
+        with self.__lock:
+            self.__queued -= 1
+            self.__running += 1
+        # The workspace shares the providers and lock file of cwd, so Terraform is never re-initialised
+        workspace = os.path.join(self.__root, uuid.uuid4().hex)
+        linkWorkspace(self.__cwd, workspace)
+        try:
+            soc = SplunkObservabilityCloud(self.__token, self.__realm, workspace, self.__verbose, self.__jobs, self.__backend, self.__max_rps, self.__concurrency,
+                                           api_url=self.__api_url, output_format=output_format, dedupe_charts=self.__dedupe, client=self.__client)
+            with tracer._span(f"export {kind}", "export", root=resource_id):
+                self.__build(soc, kind, resource_id)
+                soc._flushImports()
+            if kind in ["dashboardgroup", "dashboard"]:
+                with tracer._span("postProcess", "postprocess"):
+                    postProcess(workspace)
+            files = {}
+            for filename in sorted(os.listdir(workspace)):
+                if filename.endswith((".tf", ".tf.json")) and filename != "main.tf":
+                    with open(os.path.join(workspace, filename), "r") as f:
+                        files[filename] = f.read()
+            return files, soc._getPendingOutput()
+        finally:
+            shutil.rmtree(workspace, ignore_errors=True)
+            with self.__lock:
+                self.__running -= 1
+
+    def _serve(self) -> None:
+        # Workspaces left behind by a daemon that was killed
+        shutil.rmtree(self.__root, ignore_errors=True)
+        if self.__backend != "native":
+            # Providers are installed once, up front, rather than by the first request
+            if terraformInit(self.__cwd, self.__token, self.__realm, self.__verbose) != 0:
+                raise RuntimeError(
+                    "Terraform init failed, rerun with --verbose for details")
+        print(f"Serving exports on {self._getAddress()}, {self.__workers} at a time (Ctrl-C to stop)")
+        try:
+            self.__server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.__server.server_close()
+            self.__executor.shutdown(wait=True, cancel_futures=True)
+            shutil.rmtree(self.__root, ignore_errors=True)
@@ -0,0 +1,474 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import re
+
+from helperFunctions import *
+
+# HCL Formatting
+#
+# Attributes are plain dictionaries. A list of dictionaries is rendered as repeated
+# nested blocks, any other dictionary as a map, and None or empty values are left out.
+
+
+def isBlock(value):
+    return isinstance(value, list) and len(value) > 0 and all(isinstance(item, dict) for item in value)
+
+
+def isEmpty(value):
+    return value is None or value == "" or value == [] or value == {}
+
+
+def formatString(value):
+    value = value.replace('${', '$${').replace('%{', '%%{')
+    if value.endswith('\n') and not re.search(r'[\x00-\x08\x0b-\x1f\x7f]', value):
+        # Multi-line text (e.g. SignalFlow programs) reads better as a heredoc. A plain <<EOT keeps
+        # the indentation as is, and the delimiter must not appear on a line of its own in the text
+        lines = {line.strip() for line in value.split('\n')}
+        delimiter = "EOT"
+        suffix = 0
+        while delimiter in lines:
+            suffix += 1
+            delimiter = f"EOT{suffix}"
+        return f"<<{delimiter}\n{value}{delimiter}"
+    # HCL has no \b or \f escapes, control characters are written as \uXXXX
+    return re.sub(r'\\([\\"/bfnrtu])', lambda match: {"b": "\\u0008", "f": "\\u000c"}.get(match.group(1), match.group(0)),
+                  json.dumps(value, ensure_ascii=False))
+
+
+def formatValue(value, depth):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return json.dumps(value)
+    if isinstance(value, str):
+        return formatString(value)
+    if isinstance(value, list):
+        return "[" + ", ".join(formatValue(item, depth) for item in value) + "]"
+    if isinstance(value, dict):
+        padding = "    " * (depth + 1)
+        lines = ["{"]
+        for key, item in value.items():
+            if not re.match(r'^[a-zA-Z_][\w-]*$', key):
+                key = json.dumps(key)
+            lines.append(f"{padding}{key} = {formatValue(item, depth + 1)}")
+        lines.append("    " * depth + "}")
+        return "\n".join(lines)
+    return formatString(str(value))
+
+
+def formatBody(attributes, depth=1):
+    padding = "    " * depth
+    lines = []
+    scalars = [(key, value) for key, value in attributes.items()
+               if not isEmpty(value) and not isBlock(value)]
+    width = max([len(key) for key, _ in scalars], default=0)
+    for key, value in scalars:
+        lines.append(f"{padding}{key.ljust(width)} = {formatValue(value, depth)}")
+    for key, value in attributes.items():
+        if isBlock(value):
+            for block in value:
+                lines.append(f"{padding}{key} {{")
+                lines.extend(formatBody(block, depth + 1))
+                lines.append(f"{padding}}}")
+    return lines
+
+
+def filterAttributes(attributes, exclude):
+    # Drop the excluded attributes, including those of nested blocks
+    filtered = {}
+    for key, value in attributes.items():
+        if key in exclude:
+            continue
+        if isBlock(value):
+            value = [filterAttributes(block, exclude) for block in value]
+        filtered[key] = value
+    return filtered
+
+
+def formatResource(resource_type, resource_name, attributes):
+    # Same layout as `terraform state show`, so the rest of the pipeline can treat both alike
+    lines = [f"# {resource_type}.{resource_name}:",
+             f"resource \"{resource_type}\" \"{resource_name}\" {{"]
+    lines.extend(formatBody(attributes))
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def jsonValue(value):
+    # Strings are templates in JSON syntax as well, so interpolation sequences are escaped the same way
+    if isinstance(value, str):
+        return value.replace('${', '$${').replace('%{', '%%{')
+    if isinstance(value, list):
+        return [jsonValue(item) for item in value]
+    if isinstance(value, dict):
+        return {key: jsonValue(item) for key, item in value.items()}
+    return value
+
+
+def jsonBody(attributes):
+    body = {}
+    for key, value in attributes.items():
+        if isEmpty(value):
+            continue
+        if isBlock(value):
+            body[key] = [jsonBody(block) for block in value]
+        else:
+            body[key] = jsonValue(value)
+    return body
+
+
+def formatResourceJSON(resource_type, resource_name, attributes):
+    # A document holding just this resource, merged with the rest of its file when written
+    return formatJSON({"resource": {resource_type: {resource_name: jsonBody(attributes)}}})
+
+
+def formatAs(output_format, resource_type, resource_name, attributes):
+    if output_format == "json":
+        return formatResourceJSON(resource_type, resource_name, attributes)
+    return formatResource(resource_type, resource_name, attributes)
+
+# Content Matrix
+
+
+palette_colors = ['gray', 'blue', 'azure', 'navy', 'brown', 'orange', 'yellow', 'iris',
+                  'magenta', 'pink', 'purple', 'violet', 'lilac', 'emerald', 'green', 'aquamarine']
+
+notification_fields = {
+    'Email': ['email'],
+    'Team': ['team'],
+    'TeamEmail': ['team'],
+    'Webhook': ['credentialId', 'secret', 'url'],
+    'Slack': ['credentialId', 'channel'],
+    'Opsgenie': ['credentialId', 'credentialName', 'responderName', 'responderId', 'responderType'],
+    'VictorOps': ['credentialId', 'routingKey'],
+}
+
+
+def seconds(milliseconds):
+    if milliseconds is None:
+        return None
+    return int(milliseconds // 1000)
+
+
+def snakeCase(name):
+    return re.sub(r'(?<=[a-z])(?=[A-Z0-9])', '_', name).lower()
+
+
+def paletteColor(index):
+    if index is None or not 0 <= index < len(palette_colors):
+        return None
+    return palette_colors[index]
+
+
+def formatNotification(notification):
+    # Provider notation, e.g. "Email,foo@example.com" or "Slack,<credentialId>,<channel>"
+    fields = notification_fields.get(
+        notification.get('type'), ['credentialId'])
+    return ",".join([notification.get('type', '')] + [str(notification.get(field) or '') for field in fields])
+
+# API Mapping
+
+
+def mapTime(time):
+    time = time or {}
+    if time.get('type') == 'absolute':
+        return {'start_time': seconds(time.get('start')), 'end_time': seconds(time.get('end'))}
+    return {'time_range': seconds(time.get('range'))}
+
+
+def mapVizOptions(options, include_axis=False):
+    viz_options = []
+    for label in options or []:
+        viz_option = {
+            'label': label.get('label'),
+            'display_name': label.get('displayName'),
+            'color': paletteColor(label.get('paletteIndex')),
+            'value_unit': label.get('valueUnit'),
+            'value_prefix': label.get('valuePrefix'),
+            'value_suffix': label.get('valueSuffix'),
+        }
+        if include_axis:
+            viz_option['axis'] = {0: 'left', 1: 'right'}.get(label.get('yAxis'))
+            viz_option['plot_type'] = label.get('plotType')
+        viz_options.append(viz_option)
+    return viz_options
+
+
+def mapColorScale(scales):
+    return [{
+        'gt': scale.get('gt'),
+        'gte': scale.get('gte'),
+        'lt': scale.get('lt'),
+        'lte': scale.get('lte'),
+        'color': paletteColor(scale.get('paletteIndex')),
+    } for scale in scales or []]
+
+
+def mapLegendFields(legend):
+    return [{'property': field.get('property'), 'enabled': field.get('enabled')}
+            for field in (legend or {}).get('fields') or []]
+
+
+def mapAxis(axis):
+    axis = {
+        'label': axis.get('label'),
+        'min_value': axis.get('min'),
+        'max_value': axis.get('max'),
+        'high_watermark': axis.get('highWatermark'),
+        'high_watermark_label': axis.get('highWatermarkLabel'),
+        'low_watermark': axis.get('lowWatermark'),
+        'low_watermark_label': axis.get('lowWatermarkLabel'),
+    }
+    if all(isEmpty(value) for value in axis.values()):
+        return []
+    return [axis]
+
+
+def mapSortBy(options):
+    if options.get('sortBy'):
+        return options['sortBy']
+    if options.get('sortProperty'):
+        direction = '-' if options.get('sortDirection') == 'Descending' else '+'
+        return direction + options['sortProperty']
+    return None
+
+
+def mapChart(data):
+    options = data.get('options') or {}
+    program_options = options.get('programOptions') or {}
+    chart_type = options.get('type')
+    attributes = {
+        'name': data.get('name'),
+        'description': data.get('description'),
+    }
+    if chart_type == 'Text':
+        attributes['markdown'] = options.get('markdown')
+        return attributes
+    attributes['program_text'] = data.get('programText')
+    if chart_type == 'Event':
+        attributes.update(mapTime(options.get('time')))
+        return attributes
+    attributes.update({
+        'unit_prefix': options.get('unitPrefix'),
+        'max_delay': seconds(program_options.get('maxDelay')),
+    })
+    if chart_type != 'SingleValue':
+        attributes['disable_sampling'] = program_options.get('disableSampling')
+    if chart_type in ['TimeSeriesChart', 'TableChart', 'Heatmap']:
+        attributes['minimum_resolution'] = seconds(
+            program_options.get('minimumResolution'))
+    if chart_type in ['SingleValue', 'List', 'TableChart', 'Heatmap']:
+        attributes['refresh_interval'] = seconds(
+            options.get('refreshInterval'))
+    if chart_type in ['SingleValue', 'List', 'TimeSeriesChart']:
+        attributes['color_by'] = options.get('colorBy')
+    if chart_type in ['SingleValue', 'List']:
+        attributes['max_precision'] = options.get('maximumPrecision')
+        attributes['secondary_visualization'] = options.get(
+            'secondaryVisualization')
+    if chart_type == 'SingleValue':
+        attributes['is_timestamp_hidden'] = options.get('timestampHidden')
+        attributes['show_spark_line'] = options.get('showSparkLine')
+    if chart_type in ['List', 'Heatmap']:
+        attributes['sort_by'] = mapSortBy(options)
+    if chart_type == 'List':
+        attributes['hide_missing_values'] = options.get('hideMissingValues')
+    if chart_type in ['TableChart', 'Heatmap']:
+        attributes['group_by'] = options.get('groupBy')
+        attributes['hide_timestamp'] = options.get('timestampHidden')
+    if chart_type == 'Heatmap':
+        attributes['timezone'] = options.get('timezone')
+        color_range = options.get('colorRange')
+        if color_range:
+            attributes['color_range'] = [{
+                'min_value': color_range.get('min'),
+                'max_value': color_range.get('max'),
+                'color': color_range.get('color'),
+            }]
+    if chart_type in ['TimeSeriesChart', 'List']:
+        attributes.update(mapTime(options.get('time')))
+        attributes['legend_options_fields'] = mapLegendFields(
+            options.get('legendOptions'))
+    if chart_type == 'TimeSeriesChart':
+        axes = options.get('axes') or []
+        attributes.update({
+            'plot_type': options.get('defaultPlotType'),
+            'stacked': options.get('stacked'),
+            'axes_precision': options.get('axisPrecision'),
+            'axes_include_zero': options.get('includeZero'),
+            'show_event_lines': options.get('showEventLines'),
+            'show_data_markers': (options.get('lineChartOptions') or {}).get('showDataMarkers'),
+            'axis_left': mapAxis(axes[0]) if len(axes) > 0 and axes[0] else [],
+            'axis_right': mapAxis(axes[1]) if len(axes) > 1 and axes[1] else [],
+        })
+        legend = options.get('onChartLegendOptions') or {}
+        if legend.get('showLegend'):
+            attributes['on_chart_legend_dimension'] = legend.get(
+                'dimensionInLegend')
+    if chart_type in ['SingleValue', 'List', 'Heatmap']:
+        attributes['color_scale'] = mapColorScale(options.get('colorScale2'))
+    if chart_type != 'Heatmap':
+        attributes['viz_options'] = mapVizOptions(options.get(
+            'publishLabelOptions'), chart_type == 'TimeSeriesChart')
+    return attributes
+
+
+def mapDashboardGroup(data):
+    return {
+        'name': data.get('name'),
+        'description': data.get('description'),
+        'teams': data.get('teams'),
+    }
+
+
+def mapDashboard(data):
+    filters = data.get('filters') or {}
+    time = filters.get('time') or {}
+    attributes = {
+        'name': data.get('name'),
+        'description': data.get('description'),
+        'dashboard_group': data.get('groupId'),
+        'charts_resolution': (data.get('chartDensity') or '').lower(),
+    }
+    if isinstance(time.get('start'), str):
+        attributes['time_range'] = time.get('start')
+    else:
+        attributes['start_time'] = seconds(time.get('start'))
+        attributes['end_time'] = seconds(time.get('end'))
+    attributes['chart'] = [{
+        'chart_id': chart.get('chartId'),
+        'column': chart.get('column'),
+        'height': chart.get('height'),
+        'row': chart.get('row'),
+        'width': chart.get('width'),
+    } for chart in data.get('charts') or []]
+    attributes['variable'] = [{
+        'property': variable.get('property'),
+        'alias': variable.get('alias'),
+        'description': variable.get('description'),
+        'values': variable.get('value'),
+        'value_required': variable.get('required'),
+        'values_suggested': variable.get('preferredSuggestions'),
+        'restricted_suggestions': variable.get('restricted'),
+        'replace_only': variable.get('replaceOnly'),
+        'apply_if_exist': variable.get('applyIfExists'),
+    } for variable in filters.get('variables') or []]
+    attributes['filter'] = [{
+        'property': source.get('property'),
+        'values': source.get('value'),
+        'negated': source.get('NOT'),
+        'apply_if_exist': source.get('applyIfExists'),
+    } for source in filters.get('sources') or []]
+    return attributes
+
+
+def mapDetector(data):
+    visualization = data.get('visualizationOptions') or {}
+    attributes = {
+        'name': data.get('name'),
+        'description': data.get('description'),
+        'program_text': data.get('programText'),
+        'max_delay': seconds(data.get('maxDelay')),
+        'min_delay': seconds(data.get('minDelay')),
+        'timezone': data.get('timezone'),
+        'teams': data.get('teams'),
+        'tags': data.get('tags'),
+        'show_data_markers': visualization.get('showDataMarkers'),
+        'show_event_lines': visualization.get('showEventLines'),
+        'disable_sampling': visualization.get('disableSampling'),
+    }
+    attributes.update(mapTime(visualization.get('time')))
+    attributes['rule'] = [{
+        'detect_label': rule.get('detectLabel'),
+        'severity': rule.get('severity'),
+        'description': rule.get('description'),
+        'disabled': rule.get('disabled'),
+        'notifications': [formatNotification(notification) for notification in rule.get('notifications') or []],
+        'parameterized_subject': rule.get('parameterizedSubject'),
+        'parameterized_body': rule.get('parameterizedBody'),
+        'runbook_url': rule.get('runbookUrl'),
+        'tip': rule.get('tip'),
+    } for rule in data.get('rules') or []]
+    attributes['viz_options'] = mapVizOptions(
+        visualization.get('publishLabelOptions'))
+    return attributes
+
+
+def mapSLO(data):
+    inputs = data.get('inputs') or {}
+    return {
+        'name': data.get('name'),
+        'description': data.get('description'),
+        'type': data.get('type'),
+        'input': [{
+            'program_text': inputs.get('programText'),
+            'good_events_label': inputs.get('goodEventsLabel'),
+            'total_events_label': inputs.get('totalEventsLabel'),
+        }],
+        'target': [{
+            'type': target.get('type'),
+            'slo': target.get('slo'),
+            'compliance_period': target.get('compliancePeriod'),
+            'cycle_type': target.get('cycleType'),
+            'cycle_start': target.get('cycleStart'),
+            'alert_rule': [{
+                'type': alert_rule.get('type'),
+                'rule': [{
+                    'severity': rule.get('severity'),
+                    'notifications': [formatNotification(notification) for notification in rule.get('notifications') or []],
+                    'parameters': [{snakeCase(key): value for key, value in rule['parameters'].items()}] if rule.get('parameters') else [],
+                } for rule in alert_rule.get('rules') or []],
+            } for alert_rule in target.get('sloAlertRules') or []],
+        } for target in data.get('targets') or []],
+    }
+
+
+resource_mapping = {
+    'signalfx_dashboard_group': mapDashboardGroup,
+    'signalfx_dashboard': mapDashboard,
+    'signalfx_detector': mapDetector,
+    'signalfx_slo': mapSLO,
+}
+
+
+def renderResource(resource_address, data, exclude=(), output_format="hcl"):
+    # Render a resource straight from its /v2 API response, without Terraform
+    resource_type, resource_name = resource_address.split(".", 1)
+    if resource_type in chart_naming.values():
+        attributes = mapChart(data)
+    else:
+        attributes = resource_mapping[resource_type](data)
+    return formatAs(output_format, resource_type, resource_name, filterAttributes(attributes, exclude))
+
+
+def renderState(resource_address, values, exclude=(), output_format="hcl"):
+    # Render a resource from its attribute values in `terraform show -json` output
+    resource_type, resource_name = resource_address.split(".", 1)
+    return formatAs(output_format, resource_type, resource_name, filterAttributes(values, exclude))
+
+
+def stateResources(state):
+    # Map resource addresses to their attribute values, from either a state or a saved plan
+    resources = {}
+    if state == None:
+        return resources
+    for resource in state.get("values", {}).get("root_module", {}).get("resources", []):
+        resources[resource["address"]] = resource.get("values") or {}
+    for change in state.get("resource_changes", []):
+        after = change.get("change", {}).get("after")
+        if after != None:
+            resources.setdefault(change["address"], after)
+    return resources
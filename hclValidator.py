@@ -0,0 +1,199 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from tracerClass import tracer
+
+# Structural checks of the generated files, without Terraform:
+#   - balanced {} [] () and terminated strings (HCL) or valid JSON (Terraform JSON syntax)
+#   - every signalfx_* reference resolves to a resource in the same root module, declared once
+#   - no PLACEHOLDER left behind, and no chart_id still holding a raw chart id
+
+token_pattern = re.compile(
+    r'"(?:[^"\\\n]|\\.)*(?P<closed>")?|#[^\n]*|//[^\n]*|/\*[\s\S]*?(?:\*/|$)|<<-?(?P<heredoc>\w+)\n|[{}\[\]()]')
+resource_pattern = re.compile(
+    r'^resource\s+"([\w-]+)"\s+"([\w-]+)"', re.MULTILINE)
+reference_pattern = re.compile(r'\b(signalfx_\w+\.[\w-]+)\.\w+')
+raw_chart_pattern = re.compile(r'\bchart_id\s*=\s*"')
+brackets = {"}": "{", "]": "[", ")": "("}
+
+
+def lineOf(newlines, position):
+    return bisect.bisect_right(newlines, position - 1) + 1
+
+
+def blank(text):
+    return re.sub(r'[^\n]', ' ', text)
+
+
+def scanHCL(content, newlines):
+    # Returns the code with strings, comments and heredocs blanked out, the text with only comments
+    # and heredocs blanked out (same offsets), and the bracket and string errors as (line, message)
+    code = []
+    text = []
+    errors = []
+    stack = []
+    position = 0
+    match = token_pattern.search(content)
+    while match:
+        token = match.group(0)
+        start = match.start()
+        end = match.end()
+        code.append(content[position:start])
+        text.append(content[position:start])
+        if token.startswith('"'):
+            if match.group("closed") == None:
+                errors.append((lineOf(newlines, start), "unterminated string"))
+                code.append('"' + " " * (len(token) - 1))
+            else:
+                code.append('"' + " " * (len(token) - 2) + '"')
+            text.append(token)
+        elif token[0] in "#/":
+            code.append(blank(token))
+            text.append(blank(token))
+        elif token.startswith("<<"):
+            closing = re.compile(
+                rf'^\s*{match.group("heredoc")}\s*$', re.MULTILINE).search(content, end)
+            if closing == None:
+                errors.append((lineOf(newlines, start),
+                              f"heredoc {match.group('heredoc')} is never closed"))
+                end = len(content)
+            else:
+                end = closing.end()
+            code.append(blank(content[start:end]))
+            text.append(blank(content[start:end]))
+        elif token in "{[(":
+            stack.append((token, start))
+            code.append(token)
+            text.append(token)
+        else:
+            if not stack:
+                errors.append((lineOf(newlines, start),
+                              f"unexpected '{token}' with no open block"))
+            elif stack[-1][0] != brackets[token]:
+                opener, opened = stack.pop()
+                errors.append((lineOf(newlines, start),
+                              f"'{token}' closes the '{opener}' opened on line {lineOf(newlines, opened)}"))
+            else:
+                stack.pop()
+            code.append(token)
+            text.append(token)
+        position = end
+        match = token_pattern.search(content, position)
+    code.append(content[position:])
+    text.append(content[position:])
+    for opener, opened in stack:
+        errors.append((lineOf(newlines, opened),
+                      f"'{opener}' is never closed"))
+    return "".join(code), "".join(text), errors
+
+
+def validateFile(path, allow_placeholder=False):
+    # Parse one file, returning its errors as (line, message), the resources it declares as
+    # (address, line) and the resources it references as (address, line)
+    with open(path, "r") as f:
+        content = f.read()
+    newlines = [match.start() for match in re.finditer('\n', content)]
+    declared = []
+    if path.endswith(".tf.json"):
+        try:
+            document = json.loads(content)
+        except ValueError as e:
+            return [(getattr(e, "lineno", 1), f"invalid JSON: {getattr(e, 'msg', e)}")], [], []
+        errors = []
+        position = 0
+        for resource_type, resources in (document.get("resource") or {}).items():
+            for resource_name in resources:
+                # Resources appear in file order, so each is searched for after the previous one
+                header = re.compile(
+                    rf'"{re.escape(resource_name)}"\s*:\s*{{').search(content, position)
+                if header != None:
+                    position = header.end()
+                declared.append((f"{resource_type}.{resource_name}",
+                                 lineOf(newlines, header.start()) if header else 1))
+        references = [(match.group(1), lineOf(newlines, match.start()))
+                      for match in re.finditer(r'\$\{(signalfx_\w+\.[\w-]+)\.\w+\}', content)]
+        raw_charts = re.finditer(r'"chart_id"\s*:\s*"(?!\$\{)', content)
+        code = text = content
+    else:
+        code, text, errors = scanHCL(content, newlines)
+        for match in resource_pattern.finditer(content):
+            # Skip resource blocks inside comments or heredocs
+            if text.startswith("resource", match.start()):
+                declared.append((f"{match.group(1)}.{match.group(2)}",
+                                 lineOf(newlines, match.start())))
+        references = [(match.group(1), lineOf(newlines, match.start()))
+                      for match in reference_pattern.finditer(code)]
+        raw_charts = raw_chart_pattern.finditer(code)
+    for match in raw_charts:
+        errors.append((lineOf(newlines, match.start()),
+                      "chart_id holds a raw chart id instead of a reference to a chart resource"))
+    if not allow_placeholder:
+        for match in re.finditer(r'\bPLACEHOLDER\b', text):
+            errors.append((lineOf(newlines, match.start()),
+                          "PLACEHOLDER left in place of a value"))
+    return errors, declared, references
+
+
+def rootModules(cwd):
+    # cwd, and the root modules created by --split
+    modules = [cwd]
+    roots = os.path.join(cwd, "roots")
+    if os.path.isdir(roots):
+        modules.extend(os.path.join(roots, name) for name in sorted(os.listdir(roots))
+                       if os.path.isdir(os.path.join(roots, name)))
+    return modules
+
+
+def validateOutput(cwd, allow_placeholder=False, workers=None):
+    # Validate every generated file in a process pool, then resolve references per root module.
+    # Returns the problems as "file:line: message", relative to cwd
+    files = []
+    for module in rootModules(cwd):
+        files.extend(os.path.join(module, filename) for filename in sorted(os.listdir(module))
+                     if filename.endswith((".tf", ".tf.json")) and filename != "main.tf"
+                     and os.path.isfile(os.path.join(module, filename)))
+    if not files:
+        return []
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    with tracer._span("validateOutput", "postprocess", files=len(files)):
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(files) // (workers * 4))
+            results = list(executor.map(validateFile, files,
+                           repeat(allow_placeholder), chunksize=chunksize))
+
+    problems = []
+    declarations = {}
+    for path, (errors, declared, _) in zip(files, results):
+        module = os.path.dirname(path)
+        for line, message in errors:
+            problems.append((path, line, message))
+        for address, line in declared:
+            previous = declarations.setdefault((module, address), (path, line))
+            if previous != (path, line):
+                problems.append(
+                    (path, line, f"{address} is already declared in {os.path.relpath(previous[0], cwd)}:{previous[1]}"))
+    for path, (_, _, references) in zip(files, results):
+        module = os.path.dirname(path)
+        for address, line in references:
+            if (module, address) not in declarations:
+                problems.append(
+                    (path, line, f"reference to {address}, which is not declared in this root module"))
+    return [f"{os.path.relpath(path, cwd)}:{line}: {message}" for path, line, message in sorted(problems)]
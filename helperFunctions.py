@@ -12,45 +12,136 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import uuid
+import hashlib
 import os
 import re
 import json
 import subprocess
 import shutil
-import requests
-from collections import defaultdict
+
+from tracerClass import tracer
 
 # Terraform Components
 
 
+def runTerraform(command, working_dir, **tags):
+    # Every Terraform launch goes through here, so that it shows up in --profile traces
+    name = " ".join(command[:3] if command[1] == "state" else command[:2])
+    with tracer._span(name, "terraform", **tags):
+        process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=working_dir)
+        stdout, stderr = process.communicate()
+    return process.returncode, stdout, stderr
+
+
+def configureProviders(cwd, plugin_cache=None, provider_mirror=None):
+    # Share downloaded providers between runs and output directories
+    if plugin_cache:
+        os.makedirs(plugin_cache, exist_ok=True)
+        os.environ["TF_PLUGIN_CACHE_DIR"] = plugin_cache
+    if provider_mirror:
+        # Install providers from a local mirror only, e.g. on air-gapped runners
+        config = os.path.join(cwd, ".terraformrc")
+        with open(config, "w") as f:
+            f.write(f"provider_installation {{\n")
+            f.write(f"    filesystem_mirror {{\n")
+            f.write(
+                f"        path = {json.dumps(os.path.abspath(provider_mirror))}\n")
+            f.write(f"    }}\n")
+            f.write(f"}}\n")
+        os.environ["TF_CLI_CONFIG_FILE"] = config
+
+
+def providerTemplate():
+    # main.tf ships with the exporter, in adt-resources next to the modules in a checkout or
+    # the Docker image, and as the adt_resources package data once installed
+    here = os.path.dirname(os.path.abspath(__file__))
+    for directory in ["adt-resources", "adt_resources"]:
+        path = os.path.join(here, directory, "main.tf")
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(
+        "The bundled main.tf is missing, please reinstall the exporter")
+
+
+def initMarker(working_dir):
+    # Fingerprint of the configuration the working directory was initialised for
+    try:
+        with open(os.path.join(working_dir, "main.tf"), "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+# API fields that change without the resource's definition changing
+volatile_fields = {"created", "creator", "lastUpdated",
+                   "lastUpdatedBy", "lastUpdatedByName", "createdByName"}
+
+
+def definitionHash(data):
+    # Content hash of a resource's API definition, independent of key order and audit fields
+    definition = {key: value for key, value in data.items()
+                  if key not in volatile_fields}
+    return hashlib.sha256(json.dumps(definition, sort_keys=True).encode()).hexdigest()
+
+
 def terraformInit(working_dir, o11y_api_token, o11y_realm, verbose=False):
-    command = ["terraform", "init", "-var",
+    # Providers and the lock file are kept between runs, so an unchanged workspace needs no init
+    marker_file = os.path.join(working_dir, ".terraform", "main.tf.sha256")
+    marker = initMarker(working_dir)
+    if os.path.exists(os.path.join(working_dir, ".terraform.lock.hcl")):
+        try:
+            with open(marker_file, "r") as f:
+                if marker != None and f.read() == marker:
+                    if verbose:
+                        print("Terraform already initialised, skipping init")
+                    return 0
+        except FileNotFoundError:
+            pass
+
+    command = ["terraform", "init", "-input=false", "-var",
                f"o11y_api_token={o11y_api_token}", "-var", f"o11y_realm={o11y_realm}"]
 
-    process = subprocess.Popen(
-        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=working_dir)
-    stdout, stderr = process.communicate()
+    returncode, stdout, stderr = runTerraform(command, working_dir)
 
-    if process.returncode != 0:
+    if returncode != 0:
         if verbose:
             print(f"Error executing Terraform init: {stderr.decode()}")
         return 1
     else:
         if verbose:
             print(f"Terraform init successful: {stdout.decode()}")
+        if marker != None:
+            with open(marker_file, "w") as f:
+                f.write(marker)
         return 0
 
 
+def linkWorkspace(cwd, workspace):
+    # Scratch working directory sharing the providers and lock file initialised in cwd
+    shutil.rmtree(workspace, ignore_errors=True)
+    os.makedirs(workspace)
+    shutil.copy(os.path.join(cwd, "main.tf"), workspace)
+    lock_file = os.path.join(cwd, ".terraform.lock.hcl")
+    if os.path.exists(lock_file):
+        shutil.copy(lock_file, workspace)
+    plugins = os.path.join(cwd, ".terraform")
+    try:
+        os.symlink(plugins, os.path.join(workspace, ".terraform"),
+                   target_is_directory=True)
+    except OSError:
+        # Symlinks may be unavailable (e.g. Windows without developer mode)
+        shutil.copytree(plugins, os.path.join(workspace, ".terraform"))
+
+
 def terraformImport(resource_address, resource_id, working_dir, o11y_api_token, o11y_realm, verbose=False):
     command = ["terraform", "import", "-var",
                f"o11y_api_token={o11y_api_token}", "-var", f"o11y_realm={o11y_realm}", resource_address, resource_id]
 
-    process = subprocess.Popen(
-        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=working_dir)
-    stdout, stderr = process.communicate()
+    returncode, stdout, stderr = runTerraform(
+        command, working_dir, type=resource_address.split(".")[0], id=resource_id)
 
-    if process.returncode != 0:
+    if returncode != 0:
         if verbose:
             print(f"Error executing Terraform import: {stderr.decode()}")
     else:
@@ -61,11 +152,10 @@ def terraformImport(resource_address, resource_id, working_dir, o11y_api_token,
 def terraformState(resource_address, resource_id, working_dir, o11y_api_token, o11y_realm, verbose=False):
     command = ["terraform", "state", "show", resource_address]
 
-    process = subprocess.Popen(
-        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=working_dir)
-    stdout, stderr = process.communicate()
+    returncode, stdout, stderr = runTerraform(
+        command, working_dir, type=resource_address.split(".")[0], id=resource_id)
 
-    if process.returncode != 0:
+    if returncode != 0:
         if verbose:
             print(f"Error executing Terraform state: {stderr.decode()}")
         return ""
@@ -73,15 +163,53 @@ def terraformState(resource_address, resource_id, working_dir, o11y_api_token, o
         return stdout.decode()
 
 
+def terraformGenerateConfig(working_dir, config_file, o11y_api_token, o11y_realm, verbose=False, plan_file=None):
+    # Requires Terraform 1.5+ for `import {}` blocks
+    command = ["terraform", "plan", "-input=false", f"-generate-config-out={config_file}", "-var",
+               f"o11y_api_token={o11y_api_token}", "-var", f"o11y_realm={o11y_realm}"]
+    if plan_file != None:
+        command.append(f"-out={plan_file}")
+
+    returncode, stdout, stderr = runTerraform(command, working_dir)
+
+    # Terraform still writes the generated configuration when the plan itself reports errors
+    if returncode != 0:
+        if verbose:
+            print(f"Error executing Terraform plan: {stderr.decode()}")
+        return 1
+    else:
+        if verbose:
+            print(f"Terraform plan successful: {stdout.decode()}")
+        return 0
+
+
+def terraformShow(working_dir, plan_file=None, verbose=False):
+    # The whole state (or a saved plan) as JSON, in a single process launch
+    command = ["terraform", "show", "-json"]
+    if plan_file != None:
+        command.append(plan_file)
+
+    returncode, stdout, stderr = runTerraform(command, working_dir)
+
+    if returncode != 0:
+        if verbose:
+            print(f"Error executing Terraform show: {stderr.decode()}")
+        return None
+    try:
+        return json.loads(stdout.decode())
+    except ValueError:
+        if verbose:
+            print("Terraform show did not return valid JSON")
+        return None
+
+
 def terraformValidate(working_dir, o11y_api_token, o11y_realm, verbose=False):
     command = ["terraform", "validate", "-var",
                f"o11y_api_token={o11y_api_token}", "-var", f"o11y_realm={o11y_realm}"]
 
-    process = subprocess.Popen(
-        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=working_dir)
-    stdout, stderr = process.communicate()
+    returncode, stdout, stderr = runTerraform(command, working_dir)
 
-    if process.returncode != 0:
+    if returncode != 0:
         if verbose:
             print(f"Error executing Terraform validate: {stderr.decode()}")
         return 1
@@ -110,115 +238,392 @@ def getChartType(chart_type):
 # Terraform Management
 
 
-def handleDuplicateCharts(cwd, verbose=False):
-    files = [f for f in os.listdir(cwd) if os.path.isfile(
-        os.path.join(cwd, f)) and f.endswith('.tf')]
-
-    resource_files = defaultdict(list)
-    for file in files:
-        with open(os.path.join(cwd, file), 'r') as f:
-            content = f.read()
-            chart_resources = re.findall(
-                r'resource "(\w+_chart)" "([\w-]+)" {', content)
-            for resource_type, resource_name in chart_resources:
-                resource_files[resource_name].append(file)
-
-    duplicates_only = {resource_name: filenames for resource_name,
-                       filenames in resource_files.items() if len(filenames) > 1}
-
-    if not duplicates_only:
-        if verbose:
-            print("No Duplicates Found!")
-        return
-    else:
-        if verbose:
-            print("The following chart ids are duplicated across multiple files:")
-            for chart_id, filenames in duplicates_only.items():
-                print(f"{chart_id} in {filenames}")
-
-    for chart_id, filenames in duplicates_only.items():
-        for i, file in enumerate(filenames[1:], start=1):
-            with open(os.path.join(cwd, file), 'r') as f:
-                content = f.read()
-            new_chart_id = f"{chart_id}-{str(uuid.uuid4())[:8]}"
-            content = content.replace(chart_id, new_chart_id)
-            with open(os.path.join(cwd, file), 'w') as f:
-                f.write(content)
-
-
-def cleanup(cwd):
-    shutil.rmtree(os.path.join(cwd, ".terraform"), ignore_errors=True)
-    os.remove(os.path.join(cwd, ".terraform.lock.hcl"))
-    os.remove(os.path.join(cwd, "terraform.tfstate"))
+def writeFile(path, content):
+    # Leave files whose content is unchanged untouched
     try:
-        os.remove(os.path.join(cwd, "terraform.tfstate.backup"))
+        with open(path, 'r') as f:
+            if f.read() == content:
+                return
     except FileNotFoundError:
-        pass  # If only run for a chart, this will error
-
-
-def updateIds(cwd):
-    # for .tf files in cwd
-    for filename in [f for f in os.listdir(cwd) if os.path.isfile(os.path.join(cwd, f)) and f.endswith('.tf')]:
-        with open(os.path.join(cwd, filename), 'r') as file:
-            content = file.read()
-
-        # Find all chart resources and their names
-        chart_resources = re.findall(
-            r'resource "(signalfx_[\w_]+_chart)" "([\w_-]+)"', content)
-        chart_ids = {resource_name for resource_type,
-                     resource_name in chart_resources}
-
-        # Replace hard-coded chart IDs in dashboard section with references to chart resources
-        for resource_type, resource_name in chart_resources:
-            content = re.sub(
-                rf'chart_id = "{resource_name}"',
-                f'chart_id = {resource_type}.{resource_name}.id',
-                content
-            )
-
-        # Write the updated content back to the file
-        with open(os.path.join(cwd, filename), 'w') as file:
-            file.write(content)
-
-
-def orphanCheck(cwd):
-    all_chart_resources = set()
-    all_dashboard_resources = []
+        pass
+    # Written to a temporary file first, so that an interrupted run never leaves a partial file
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w') as f:
+        f.write(content)
+    os.replace(temporary, path)
 
-    for filename in [f for f in os.listdir(cwd) if os.path.isfile(os.path.join(cwd, f)) and f.endswith('.tf')]:
-        with open(os.path.join(cwd, filename), 'r') as file:
-            content = file.read()
-
-        # Find all chart resources and their IDs
-        chart_resources = re.findall(
-            r'resource "signalfx_[\w_]+_chart" "([\w_-]+)"', content)
-        all_chart_resources.update(chart_resources)
-
-        # Find all dashboard resources and their associated chart IDs
-        dashboard_resources = re.findall(
-            r'resource "signalfx_dashboard" "([\w_-]+)" {.*?chart_id = "([^"]*)".*?}', content, re.DOTALL)
-        all_dashboard_resources.extend(dashboard_resources)
 
-    # Check for orphan charts across all files
+def cleanup(cwd):
+    # .terraform and the lock file are kept, so that the next run can skip init
+    for directory in [".shards", ".bulk"]:
+        shutil.rmtree(os.path.join(cwd, directory), ignore_errors=True)
+    # Depending on the backend, only some of these will exist
+    for filename in ["terraform.tfstate", "terraform.tfstate.backup"]:
+        try:
+            os.remove(os.path.join(cwd, filename))
+        except FileNotFoundError:
+            pass
+
+
+def findBlockEnd(content, start):
+    # Return the index just past the bracket that closes the one opened at content[start],
+    # skipping over quoted strings, heredocs and comments
+    depth = 0
+    i = start
+    while i < len(content):
+        char = content[i]
+        if char == '"':
+            i += 1
+            while i < len(content) and content[i] != '"':
+                i += 2 if content[i] == '\\' else 1
+        elif char == '#':
+            i = content.find('\n', i)
+            if i == -1:
+                return len(content)
+        elif content.startswith('<<', i):
+            heredoc = re.compile(r'<<-?(\w+)\n').match(content, i)
+            if heredoc:
+                closing = re.compile(
+                    rf'^\s*{heredoc.group(1)}\s*$', re.MULTILINE)
+                end = closing.search(content, heredoc.end())
+                i = end.end() if end else len(content)
+                continue
+        elif char in '{[(':
+            depth += 1
+        elif char in '}])':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return len(content)
+
+
+def iterResources(content):
+    # Yield (type, name, start, end) for each top level `resource "type" "name" { ... }` block
+    pattern = re.compile(r'^resource "([\w-]+)" "([\w-]+)" {', re.MULTILINE)
+    match = pattern.search(content)
+    while match:
+        end = findBlockEnd(content, match.end() - 1)
+        yield match.group(1), match.group(2), match.start(), end
+        match = pattern.search(content, end)
+
+
+def splitResources(content):
+    # Map each top level resource block to its address
+    return {f"{resource_type}.{resource_name}": content[start:end]
+            for resource_type, resource_name, start, end in iterResources(content)}
+
+
+def formatJSON(document):
+    # Terraform JSON syntax (--format json)
+    return json.dumps(document, indent=2, ensure_ascii=False) + "\n"
+
+
+def isJSON(terraform):
+    return terraform.lstrip().startswith("{")
+
+
+def splitResourcesJSON(content):
+    # Map each resource of a .tf.json file to its address, as a document of its own
+    resources = {}
+    for resource_type, blocks in json.loads(content).get("resource", {}).items():
+        for resource_name, attributes in blocks.items():
+            resources[f"{resource_type}.{resource_name}"] = formatJSON(
+                {"resource": {resource_type: {resource_name: attributes}}})
+    return resources
+
+
+def mergeResourcesJSON(blocks):
+    # Combine single resource documents into the document of a .tf.json file, keeping their order
+    document = {"resource": {}}
+    for block in blocks:
+        if not block:
+            continue
+        for resource_type, resources in json.loads(block).get("resource", {}).items():
+            document["resource"].setdefault(
+                resource_type, {}).update(resources)
+    return formatJSON(document)
+
+
+def setReference(terraform, attribute, expression):
+    # Point an attribute at another resource (e.g. a dashboard at its group), in either output format
+    if isJSON(terraform):
+        return re.sub(rf'("{attribute}":\s*)"[^"\n]*"',
+                      lambda match: match.group(1) + json.dumps(f"${{{expression}}}"), terraform)
+    return re.sub(rf'\b({attribute}\s*=\s*)".*"',
+                  lambda match: match.group(1) + expression, terraform)
+
+
+def dropAttributes(terraform, exclude):
+    # Remove the named attributes, at any depth, from Terraform code
+    if not exclude:
+        return terraform
+    pieces = []
+    position = 0
+    pattern = re.compile(
+        rf'^[ \t]*(?:{"|".join(map(re.escape, exclude))})\s*=[ \t]*|<<-?(\w+)\n', re.MULTILINE)
+    match = pattern.search(terraform)
+    while match:
+        heredoc = pattern.match(terraform, match.end()) if match.group(1) == None else match
+        if heredoc != None and heredoc.group(1) != None:
+            # Heredoc contents are never attributes
+            closing = re.compile(rf'^\s*{heredoc.group(1)}\s*$', re.MULTILINE)
+            end = closing.search(terraform, heredoc.end())
+            end = end.end() if end else len(terraform)
+        elif terraform.startswith(('{', '['), match.end()):
+            end = findBlockEnd(terraform, match.end())
+        else:
+            end = match.end()
+        if match.group(1) == None:
+            end = terraform.find('\n', end)
+            end = len(terraform) if end == -1 else end + 1
+            pieces.append(terraform[position:match.start()])
+            position = end
+        match = pattern.search(terraform, end)
+    pieces.append(terraform[position:])
+    return "".join(pieces)
+
+
+def resolveChartAttributes(attributes, chart_addresses, referenced):
+    # resolveChartReferences for a dashboard's attributes in Terraform JSON syntax
+    if "chart" not in attributes:
+        return
+    charts = []
+    for chart in attributes["chart"]:
+        chart_id = chart.get("chart_id")
+        reference = re.fullmatch(
+            r'\$\{(signalfx_\w+_chart)\.([\w-]+)\.id\}', chart_id or "")
+        if reference != None:
+            referenced.add(reference.group(2))
+        elif chart_id in chart_addresses:
+            chart["chart_id"] = f"${{{chart_addresses[chart_id]}.id}}"
+            referenced.add(chart_addresses[chart_id].split(".", 1)[1])
+        elif chart_id != None:
+            # Orphaned chart
+            continue
+        charts.append(chart)
+    attributes["chart"] = charts
+
+
+def resolveChartReferences(block, chart_addresses, referenced):
+    # Point the dashboard's chart_id attributes at the chart resources (chart id -> address),
+    # dropping chart blocks whose chart was not exported
+    if '{' not in block:
+        # The dashboard failed to import
+        return block
+    if isJSON(block):
+        document = json.loads(block)
+        for attributes in document["resource"].get("signalfx_dashboard", {}).values():
+            resolveChartAttributes(attributes, chart_addresses, referenced)
+        return formatJSON(document)
+    pieces = []
+    position = 0
+    pattern = re.compile(r'^[ \t]*chart\s*{', re.MULTILINE)
+    match = pattern.search(block, block.index('{') + 1)
+    while match:
+        end = findBlockEnd(block, match.end() - 1)
+        chart = block[match.start():end]
+        chart_id = re.search(
+            r'\bchart_id\s*=\s*(?:"([\w-]+)"|(signalfx_\w+_chart)\.([\w-]+)\.id)', chart)
+        if chart_id != None and chart_id.group(1) != None:
+            if chart_id.group(1) in chart_addresses:
+                address = chart_addresses[chart_id.group(1)]
+                pieces.append(block[position:match.start()])
+                pieces.append(chart[:chart_id.start()])
+                pieces.append(f"chart_id = {address}.id")
+                pieces.append(chart[chart_id.end():])
+                referenced.add(address.split(".", 1)[1])
+            else:
+                # Orphaned chart, drop the block along with the rest of its line
+                pieces.append(block[position:match.start()])
+                if block.startswith('\n', end):
+                    end += 1
+            position = end
+        elif chart_id != None:
+            referenced.add(chart_id.group(3))
+        match = pattern.search(block, end)
+    pieces.append(block[position:])
+    return "".join(pieces)
+
+
+def postProcess(cwd):
+    # Parse every output file once into an index of its resources, resolve chart
+    # references and orphans from that index, then write each file (at most) once
+    contents = {}
+    index = {}
+    chart_addresses = {}
     for filename in [f for f in os.listdir(cwd) if os.path.isfile(os.path.join(cwd, f)) and f.endswith('.tf')]:
+        with tracer._span("iterResources", "postprocess", file=filename):
+            with open(os.path.join(cwd, filename), 'r') as file:
+                contents[filename] = file.read()
+            index[filename] = list(iterResources(contents[filename]))
+        # A chart shared by several dashboards is only written to one file
+        for resource_type, resource_name, _, _ in index[filename]:
+            if re.fullmatch(r'signalfx_\w+_chart', resource_type):
+                chart_addresses[resource_name] = f"{resource_type}.{resource_name}"
+
+    # Rewrite the dashboards first, so that every chart reference is known
+    referenced = set()
+    dashboards = {}
+    for filename, resources in index.items():
+        for resource_type, resource_name, start, end in resources:
+            if resource_type == "signalfx_dashboard":
+                with tracer._span("resolveChartReferences", "postprocess", type=resource_type, resource=resource_name):
+                    dashboards[(filename, start)] = resolveChartReferences(
+                        contents[filename][start:end], chart_addresses, referenced)
+
+    for filename, resources in index.items():
+        content = contents[filename]
+        # Only charts exported alongside a dashboard can be orphaned
+        has_dashboard = any(resource_type == "signalfx_dashboard"
+                            for resource_type, _, _, _ in resources)
+        pieces = []
+        position = 0
+        for resource_type, resource_name, start, end in resources:
+            if (filename, start) in dashboards:
+                pieces.append(content[position:start])
+                pieces.append(dashboards[(filename, start)])
+                position = end
+            elif has_dashboard and chart_addresses.get(resource_name) == f"{resource_type}.{resource_name}" and resource_name not in referenced:
+                # Orphaned chart resource, drop it together with its `# address:` comments
+                header = f"# {resource_type}.{resource_name}:\n"
+                if content.endswith(header, position, start):
+                    start -= len(header)
+                trailer = re.compile(
+                    rf'\n*{re.escape(header)}').match(content, end)
+                pieces.append(content[position:start])
+                position = trailer.end() if trailer else end
+        pieces.append(content[position:])
+        with tracer._span("writeFile", "output", file=filename):
+            writeFile(os.path.join(cwd, filename), "".join(pieces))
+    postProcessJSON(cwd)
+
+
+def postProcessJSON(cwd):
+    # postProcess for --format json output, which is simply parsed rather than scanned
+    documents = {}
+    chart_addresses = {}
+    for filename in [f for f in os.listdir(cwd) if os.path.isfile(os.path.join(cwd, f)) and f.endswith('.tf.json')]:
+        with tracer._span("parseJSON", "postprocess", file=filename):
+            with open(os.path.join(cwd, filename), 'r') as file:
+                documents[filename] = json.load(file)
+        for resource_type, resources in documents[filename].get("resource", {}).items():
+            if re.fullmatch(r'signalfx_\w+_chart', resource_type):
+                for resource_name in resources:
+                    chart_addresses[resource_name] = f"{resource_type}.{resource_name}"
+
+    referenced = set()
+    for document in documents.values():
+        for resource_name, attributes in document.get("resource", {}).get("signalfx_dashboard", {}).items():
+            with tracer._span("resolveChartReferences", "postprocess", type="signalfx_dashboard", resource=resource_name):
+                resolveChartAttributes(attributes, chart_addresses, referenced)
+
+    for filename, document in documents.items():
+        resources = document.get("resource", {})
+        # Only charts exported alongside a dashboard can be orphaned
+        if "signalfx_dashboard" in resources:
+            for resource_type in [t for t in resources if re.fullmatch(r'signalfx_\w+_chart', t)]:
+                for resource_name in [n for n in resources[resource_type] if n not in referenced]:
+                    del resources[resource_type][resource_name]
+                if not resources[resource_type]:
+                    del resources[resource_type]
+        with tracer._span("writeFile", "output", file=filename):
+            writeFile(os.path.join(cwd, filename), formatJSON(document))
+
+
+def hasState(root):
+    # A root module Terraform has been run in, local state or a configured backend
+    return any(os.path.exists(os.path.join(root, filename)) for filename in
+               ["terraform.tfstate", "terraform.tfstate.backup", os.path.join(".terraform", "terraform.tfstate")])
+
+
+def splitOutput(cwd, split, owned=()):
+    # Move the output files into several root modules under cwd/roots, one per dashboard group
+    # (split == "group") or packed up to `split` resources each. Files that reference each other
+    # always go to the same root, so every reference stays intact. `owned` are the files this export
+    # wrote last time, the only ones that may be dropped from an earlier layout. Returns {file: new path}
+    files = [f for f in sorted(os.listdir(cwd)) if os.path.isfile(os.path.join(cwd, f))
+             and f.endswith(('.tf', '.tf.json')) and f != "main.tf"]
+    contents = {}
+    addresses = {}
+    owners = {}
+    for filename in files:
         with open(os.path.join(cwd, filename), 'r') as file:
-            content = file.read()
-
-        # Check if each chart ID in the dashboard resources is referenced as a resource ID
-        for dashboard_name, chart_id in all_dashboard_resources:
-            if chart_id not in all_chart_resources:
-                # This is an orphan chart ID, remove it
-                content = re.sub(
-                    r'chart\s*{\s*chart_id\s*=\s*"([^"]*)".*?}', '', content, flags=re.DOTALL)
-        # Check if each chart resource is referenced in a dashboard
-        for chart_id in all_chart_resources:
-            if not any(chart_id == id for _, id in all_dashboard_resources):
-                # This is an orphan chart resource, remove it
-                content = re.sub(
-                    rf'# signalfx_[\w_]+_chart.{chart_id}:\nresource "signalfx_[\w_]+_chart" "{chart_id}" {{.*?}}\n# signalfx_[\w_]+_chart.{chart_id}:\n', '', content, flags=re.DOTALL)
-                # Write the updated content back to the file
-        with open(os.path.join(cwd, filename), 'w') as file:
-            file.write(content)
+            contents[filename] = file.read()
+        if filename.endswith('.json'):
+            addresses[filename] = list(splitResourcesJSON(contents[filename]))
+        else:
+            addresses[filename] = list(splitResources(contents[filename]))
+        for address in addresses[filename]:
+            owners[address] = filename
+
+    # Union the files connected by references, e.g. a dashboard and the file holding a shared chart
+    parents = {filename: filename for filename in files}
+
+    def find(filename):
+        while parents[filename] != filename:
+            parents[filename] = parents[parents[filename]]
+            filename = parents[filename]
+        return filename
+
+    for filename in files:
+        for reference in re.finditer(r'\b(signalfx_\w+\.[\w-]+)\.id\b', contents[filename]):
+            other = owners.get(reference.group(1))
+            if other != None:
+                parents[find(other)] = find(filename)
+    components = {}
+    for filename in files:
+        components.setdefault(find(filename), []).append(filename)
+
+    roots = {}
+    if split == "group":
+        for component in components.values():
+            groups = [filename for filename in component if any(
+                address.startswith("signalfx_dashboard_group.") for address in addresses[filename])]
+            name = re.sub(r'-Group\.tf(\.json)?$', '',
+                          groups[0]) if groups else "ungrouped"
+            roots.setdefault(name, []).extend(component)
+    else:
+        # A component larger than the budget gets a root of its own, it cannot be split
+        size = 0
+        for component in components.values():
+            component_size = sum(len(addresses[filename])
+                                 for filename in component)
+            if not roots or (size > 0 and size + component_size > split):
+                roots[f"shard-{len(roots) + 1:03d}"] = []
+                size = 0
+            roots[list(roots)[-1]].extend(component)
+            size += component_size
+
+    moves = {}
+    for name, root_files in roots.items():
+        root = os.path.join(cwd, "roots", name)
+        os.makedirs(root, exist_ok=True)
+        shutil.copy(os.path.join(cwd, "main.tf"), root)
+        if os.path.exists(os.path.join(cwd, ".terraform.lock.hcl")):
+            shutil.copy(os.path.join(cwd, ".terraform.lock.hcl"), root)
+        for filename in root_files:
+            os.replace(os.path.join(cwd, filename),
+                       os.path.join(root, filename))
+            moves[filename] = os.path.join("roots", name, filename)
+    # Files of this export's earlier layout are dropped. Roots written by other exports are left alone,
+    # and so are the files of a root with state, which would otherwise destroy its resources on apply
+    stale = {}
+    for path in owned:
+        if path.startswith(os.path.join("roots", "")) and path not in moves.values() and os.path.isfile(os.path.join(cwd, path)):
+            stale.setdefault(os.path.dirname(path), []).append(path)
+    for directory, paths in sorted(stale.items()):
+        root = os.path.join(cwd, directory)
+        if hasState(root):
+            print(f"{directory} holds Terraform state, so its files from the earlier layout were kept: {', '.join(sorted(os.path.basename(path) for path in paths))}. "
+                  "Move their state to the new roots (terraform state mv) or destroy them, then delete the files")
+            continue
+        for path in paths:
+            os.remove(os.path.join(cwd, path))
+        if not any(filename.endswith(('.tf', '.tf.json')) and filename != "main.tf" for filename in os.listdir(root)):
+            # Nothing left to manage, only main.tf and the providers
+            shutil.rmtree(root)
+    return moves
 
 
 def setTfName(name):
@@ -0,0 +1,86 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import threading
+
+
+class Journal:
+    # Append-only log of the resources completed so far in this run (id, address, output
+    # file and Terraform code), so that an interrupted export can be resumed with --resume.
+    # Output files are only written once complete, so the code is kept here until then
+    def __init__(self, cwd, root, resume=False):
+        self.__path = os.path.join(cwd, ".journal.jsonl")
+        self.__root = root
+        self.__completed = {}
+        self.__resuming = False
+        self.__lock = threading.Lock()
+        if resume:
+            self.__resuming = self.__load()
+        # Rewritten rather than appended to, in case the interrupted run left half a line behind
+        self.__file = open(self.__path, "w")
+        self.__append({"root": root})
+        for entry in self.__completed.values():
+            self.__append(entry)
+
+    def __load(self) -> bool:
+        try:
+            with open(self.__path, "r") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            print("No interrupted export to resume, starting from scratch")
+            return False
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # The last line may have been cut short when the run was killed
+                break
+        if not entries or entries[0].get("root") != self.__root:
+            print("The interrupted export was for a different resource, starting from scratch")
+            return False
+        for entry in entries[1:]:
+            self.__completed[entry["address"]] = entry
+        print(f"Resuming, {len(self.__completed)} resources were already exported")
+        return True
+
+    def __append(self, entry) -> None:
+        self.__file.write(json.dumps(entry) + "\n")
+        self.__file.flush()
+
+    def _isResuming(self) -> bool:
+        return self.__resuming
+
+    def _completed(self, resource_address, resource_id):
+        # Terraform code of a resource finished before the interruption, if any
+        entry = self.__completed.get(resource_address)
+        if entry == None or entry["id"] != resource_id:
+            return None
+        return entry["terraform"]
+
+    def _record(self, resource_address, resource_id, filename, terraform) -> None:
+        # Failed imports are not recorded, so that they are retried when resuming
+        if not terraform:
+            return
+        with self.__lock:
+            self.__append({"address": resource_address, "id": resource_id,
+                           "file": filename, "terraform": terraform})
+
+    def _finish(self) -> None:
+        # The run completed, nothing is left to resume
+        with self.__lock:
+            self.__file.close()
+            os.remove(self.__path)
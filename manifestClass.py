@@ -0,0 +1,175 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+from helperFunctions import *
+
+
+# Addresses of the resources a block references, in HCL or Terraform JSON syntax
+reference_pattern = re.compile(r'\b(signalfx_\w+\.[\w-]+)\.id\b')
+
+
+class Manifest:
+    # Records every exported resource (id, lastUpdated, definition hash, output file) and a hash
+    # of each output file, so that an incremental run can reuse whatever has not changed since,
+    # and --check can tell whether the org has drifted from the files
+    def __init__(self, cwd, root=None):
+        self.__cwd = cwd
+        self.__path = os.path.join(cwd, ".manifest.json")
+        self.__root = root
+        self.__seen = set()
+        self.__moved = set()
+        self.__changed = []
+        self.__added = []
+        self.__blocks = {}
+        self.__lock = threading.Lock()
+        try:
+            with open(self.__path, "r") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            manifest = {}
+        self.__resources = manifest.get("resources", {})
+        self.__files = manifest.get("files", {})
+        # Where each export left its resources last time, before this run records new files
+        self.__previous_files = [(entry.get("root"), entry["file"])
+                                 for entry in self.__resources.values()]
+
+    def __fileHash(self, filename):
+        try:
+            with open(os.path.join(self.__cwd, filename), "rb") as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            return None
+
+    def _setRoot(self, root) -> None:
+        self.__root = root
+
+    def _getPreviousFiles(self) -> set:
+        # The output files this export wrote on its last run
+        return {filename for root, filename in self.__previous_files if root == self.__root}
+
+    def _previous(self, resource_address, data, output_format="hcl", references=None):
+        # Return the resource's Terraform code from the last run if it is still current. With references,
+        # the resources it points at (e.g. a dashboard's group and charts) must also have kept their addresses
+        entry = self.__resources.get(resource_address)
+        if entry == None or data == None or data.get("lastUpdated") == None:
+            return None
+        if entry.get("lastUpdated") != data.get("lastUpdated"):
+            return None
+        if references != None and entry.get("references") != sorted(set(references)):
+            # e.g. a renamed group, or a chart that is now another type of chart
+            return None
+        if entry["file"].endswith(".json") != (output_format == "json"):
+            # Exported in the other format last time
+            return None
+        filename = entry.get("file")
+        with self.__lock:
+            if filename not in self.__blocks:
+                # Each output file is read once, and not at all if edited or removed since the last run
+                self.__blocks[filename] = {}
+                if self.__fileHash(filename) == self.__files.get(filename):
+                    with open(os.path.join(self.__cwd, filename), "r") as f:
+                        content = f.read()
+                    if filename.endswith(".json"):
+                        self.__blocks[filename] = splitResourcesJSON(content)
+                    else:
+                        self.__blocks[filename] = splitResources(content)
+        block = self.__blocks[filename].get(resource_address)
+        if block == None or filename.endswith(".json"):
+            return block
+        return f"# {resource_address}:\n{block}\n"
+
+    def _record(self, resource_address, resource_id, data, filename, terraform=None) -> None:
+        with self.__lock:
+            self.__seen.add(resource_address)
+            previous = self.__resources.get(resource_address)
+            if previous != None and previous["file"] != filename:
+                # e.g. exported as .tf last time and as .tf.json now
+                self.__moved.add(previous["file"])
+            self.__resources[resource_address] = {
+                "id": resource_id,
+                "lastUpdated": data.get("lastUpdated") if data else None,
+                "definition": definitionHash(data) if data else None,
+                "file": filename,
+                "root": self.__root,
+                "references": sorted(set(reference_pattern.findall(terraform))) if isinstance(terraform, str) else [],
+            }
+
+    def _relocate(self, moves) -> None:
+        # Output files were moved, e.g. into the root modules of --split
+        with self.__lock:
+            for entry in self.__resources.values():
+                entry["file"] = moves.get(entry["file"], entry["file"])
+
+    def _compare(self, resource_address, resource_id, data) -> None:
+        # Compare a resource's current definition with the one it was exported from
+        with self.__lock:
+            self.__seen.add(resource_address)
+            entry = self.__resources.get(resource_address)
+            if entry == None or entry["id"] != resource_id:
+                self.__added.append((resource_address, resource_id))
+            elif entry.get("definition") != None:
+                if data == None or entry["definition"] != definitionHash(data):
+                    self.__changed.append((resource_address, resource_id))
+            elif data == None or entry.get("lastUpdated") != data.get("lastUpdated"):
+                # Exported before definition hashes were recorded
+                self.__changed.append((resource_address, resource_id))
+
+    def _drift(self) -> dict:
+        # Everything --check found, relative to the resources this export last wrote
+        removed = [(address, entry["id"]) for address, entry in self.__resources.items()
+                   if entry.get("root") == self.__root and address not in self.__seen]
+        files = {entry["file"] for entry in self.__resources.values()
+                 if entry.get("root") == self.__root}
+        modified = [filename for filename in sorted(files)
+                    if self.__fileHash(filename) != self.__files.get(filename)]
+        return {"changed": sorted(self.__changed), "added": sorted(self.__added),
+                "removed": sorted(removed), "modified": modified}
+
+    def __remove(self, filename) -> None:
+        # The files of a --split root with state are kept, its resources would be destroyed on the next apply
+        directory = os.path.dirname(filename)
+        if directory != "" and hasState(os.path.join(self.__cwd, directory)):
+            return
+        try:
+            os.remove(os.path.join(self.__cwd, filename))
+        except FileNotFoundError:
+            pass
+
+    def _save(self) -> None:
+        written = {self.__resources[address]["file"]
+                   for address in self.__seen}
+        for address, entry in list(self.__resources.items()):
+            if address in self.__seen:
+                continue
+            if entry.get("root") == self.__root:
+                # No longer part of this export, e.g. a dashboard removed from its group
+                if entry["file"] not in written:
+                    self.__remove(entry["file"])
+                del self.__resources[address]
+            elif self.__fileHash(entry["file"]) == None:
+                del self.__resources[address]
+        files = {entry["file"] for entry in self.__resources.values()}
+        for filename in self.__moved - files:
+            self.__remove(filename)
+        self.__files = {filename: self.__fileHash(filename)
+                        for filename in sorted(files)}
+        with open(self.__path, "w") as f:
+            json.dump({"resources": dict(sorted(self.__resources.items())),
+                      "files": self.__files}, f, indent=2)
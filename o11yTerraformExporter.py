@@ -0,0 +1,380 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import re
+import shutil
+import sys
+
+from resourceFilterClass import ResourceFilter
+from tracerClass import tracer
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(
+        description='Exporting Splunk Observability Cloud resources to Terraform.')
+    parser.add_argument('--realm', '-r', type=str, help='realm', default="au0")
+    # Requirement handled later due to docker support
+    parser.add_argument('--api-key', '-a', type=str,
+                        help='api key', required=False)
+    parser.add_argument('--dashboard', '-db', type=str, help='Dashboard ID')
+    parser.add_argument('--group', '-dg', type=str, help='Dashboard Group ID')
+    parser.add_argument('--chart', '-ch', type=str, help='Chart ID')
+    parser.add_argument('--slo', '-sl', type=str, help='SLO ID')
+    parser.add_argument('--detector', '-dt', type=str, help='Detector ID')
+    parser.add_argument('--all', nargs='?', const='groups,detectors,slos', default=None,
+                        help='Export every dashboard group, detector and SLO in the org, optionally only the given comma separated types (groups, detectors, slos)')
+    parser.add_argument('--name-regex', type=str, default=None,
+                        help='Only export the resources selected by --all whose name matches this regular expression')
+    parser.add_argument('--tag', type=str, action='append', default=None,
+                        help='Only export the resources selected by --all with this tag, may be repeated (dashboard groups: holding a dashboard with the tags)')
+    parser.add_argument('--modified-since', type=str, default=None,
+                        help='Only export the resources selected by --all modified since a duration ago (e.g. 1d, 12h) or an ISO 8601 date (dashboard groups: or holding such a dashboard)')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                        help='Enable verbose output')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Number of parallel Terraform import workers')
+    parser.add_argument('--backend', '-b', type=str, choices=['import', 'bulk', 'native'], default='import',
+                        help='Import each resource separately, all at once with Terraform import blocks (Terraform 1.5+), or render natively without Terraform')
+    parser.add_argument('--max-rps', type=float, default=None,
+                        help='Maximum API requests per second across all workers')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Maximum number of concurrent API requests when fetching resource metadata')
+    parser.add_argument('--cache', action='store_true',
+                        help='Serve chart, detector and SLO definitions from the API response cache while younger than --cache-ttl, even if edited since')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Do not read or write the API response cache (the default)')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Ignore cached API responses, fetching and caching them again')
+    parser.add_argument('--cache-ttl', type=int, default=3600,
+                        help='Seconds a cached API response is trusted for')
+    parser.add_argument('--cache-size', type=int, default=256,
+                        help='Maximum size of the API response cache in MB')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Keep existing output and only re-import resources that changed since the last run')
+    parser.add_argument('--format', type=str, choices=['hcl', 'json'], default='hcl',
+                        help='Write HCL (.tf) or Terraform JSON syntax (.tf.json) files')
+    parser.add_argument('--split', type=str, default=None,
+                        help='Split the output into several root modules under terraform_output/roots, one per dashboard group ("group") or of at most this many resources each')
+    parser.add_argument('--dedupe-charts', action='store_true',
+                        help='Export charts with identical definitions once, and point every dashboard that uses one of them at it')
+    parser.add_argument('--check', action='store_true',
+                        help='Report resources that changed, were added or were removed since the last export, without Terraform, and exit with 1 on drift')
+    parser.add_argument('--resume', action='store_true',
+                        help='Carry on from where an interrupted export of the same resource stopped')
+    parser.add_argument('--api-url', type=str, default=None,
+                        help='Base URL of the Splunk Observability Cloud API, defaults to https://api.<realm>.signalfx.com')
+    parser.add_argument('--plugin-cache', type=str, default=os.environ.get("TF_PLUGIN_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".terraform.d", "plugin-cache")),
+                        help='Terraform provider plugin cache shared between runs, empty to disable')
+    parser.add_argument('--provider-mirror', type=str, default=None,
+                        help='Install Terraform providers from this local mirror directory instead of the registry')
+    parser.add_argument('--validate', action='store_true',
+                        help='Check the generated files for unbalanced blocks, unresolved references and leftover PLACEHOLDER or raw chart ids, without Terraform; on its own, check an earlier export')
+    parser.add_argument('--profile', nargs='?', const='profile.json', default=None,
+                        help='Write a Chrome trace of API calls, Terraform launches and post-processing to this file (default: profile.json) and print the slowest phases and resources')
+    parser.add_argument('--serve', nargs='?', const='127.0.0.1:8080', default=None,
+                        help='Run as a daemon exporting resources on request over a local HTTP/JSON API at [host:]port (default: 127.0.0.1:8080)')
+    parser.add_argument('--serve-workers', type=int, default=2,
+                        help='Number of exports the daemon runs at once, further requests are queued')
+    parser.add_argument('--serve-token', type=str, default=os.environ.get("O11Y_SERVE_TOKEN"),
+                        help='Shared secret --serve requests must send as "Authorization: Bearer <token>" (default: O11Y_SERVE_TOKEN), required unless listening on a loopback address')
+    return parser.parse_args()
+
+
+def validateFiles(output_dir, allow_placeholder=False) -> int:
+    # Structural checks of the generated files, parsed in a process pool rather than by Terraform
+    from hclValidator import validateOutput
+    problems = validateOutput(output_dir, allow_placeholder)
+    for problem in problems:
+        print(problem)
+    if problems:
+        print(f"Validation found {len(problems)} problems")
+    else:
+        print("Validation found no problems")
+    return len(problems)
+
+
+def main():
+    args = parseArguments()
+
+    # --validate on its own checks an earlier export, without the API
+    if args.validate and args.all == None and args.serve == None and args.dashboard == None and args.group == None and args.chart == None and args.slo == None and args.detector == None:
+        sys.exit(1 if validateFiles(os.path.join(os.getcwd(), "terraform_output")) else 0)
+
+    # Get user input
+    if args.api_key == None:
+        args.api_key = input("Enter your API key: ")
+    if args.serve != None:
+        # Resources are chosen per request
+        host, _, port = args.serve.rpartition(":")
+        if not port.isdigit() or args.check or args.resume or args.incremental or args.cache or args.split != None or args.all != None:
+            print("--serve accepts [host:]port and cannot be combined with --check, --resume, --incremental, --cache, --split or --all")
+            sys.exit(1)
+        serve_address = (host or "127.0.0.1", int(port))
+        # Anyone reaching the daemon exports with the operator's API token
+        if not args.serve_token and serve_address[0].strip("[]") not in ["127.0.0.1", "localhost", "::1"]:
+            print("--serve on a non-loopback address requires --serve-token (or O11Y_SERVE_TOKEN)")
+            sys.exit(1)
+    elif args.all != None:
+        all_types = [t.strip() for t in args.all.split(",") if t.strip()]
+        if not all_types or any(t not in ["groups", "detectors", "slos"] for t in all_types):
+            print("--all accepts a comma separated list of: groups, detectors, slos")
+            sys.exit(1)
+    elif args.dashboard == None and args.group == None and args.chart == None and args.slo == None and args.detector == None:
+        print("No resource specified, please specify a resource to create")
+        user_choice = input(
+            "Would you like to create a dashboard, dashboard group, chart, SLO, or detector? (db/dg/ch/sl/dt): ")
+        match user_choice:
+            case "db":
+                args.dashboard = input("Enter the dashboard id: ")
+            case "dg":
+                args.group = input("Enter the dashboard group id: ")
+            case "ch":
+                args.chart = input("Enter the chart id: ")
+            case "sl":
+                args.slo = input("Enter the SLO id: ")
+            case "dt":
+                args.detector = input("Enter the detector id: ")
+            case _:
+                print("Invalid choice, please try again")
+                sys.exit(1)
+
+    # Selection filters for --all
+    try:
+        selection = ResourceFilter(
+            args.name_regex, args.tag, args.modified_since)
+    except re.error as e:
+        print(f"--name-regex is not a valid regular expression: {e}")
+        sys.exit(1)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    if not selection._isEmpty() and args.all == None:
+        print("--name-regex, --tag and --modified-since select the resources exported by --all")
+        sys.exit(1)
+
+    if args.verbose == None:
+        args.verbose = False
+
+    if args.split != None and args.split != "group":
+        try:
+            args.split = int(args.split)
+        except ValueError:
+            args.split = 0
+        if args.split < 1:
+            print("--split accepts \"group\" or a maximum number of resources per root module")
+            sys.exit(1)
+
+    if args.profile != None:
+        tracer._enable()
+
+    # Imported once the arguments are known, so that --help and usage errors return straight away.
+    # The resource classes are imported by exportRoot, for the exported types only
+    import requests
+    from helperFunctions import cleanup, configureProviders, hasState, postProcess, providerTemplate, splitOutput
+    from journalClass import Journal
+    from manifestClass import Manifest
+    from responseCacheClass import ResponseCache
+    from splunkCloud import SplunkObservabilityCloud
+
+    # Get the current working directory
+    cwd = os.getcwd()
+    # Append "terraform_output" to the current working directory
+    output_dir = os.path.join(cwd, "terraform_output")
+    # If the directory doesn't exist, create it
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    # The provider configuration ships with the exporter, so nothing is downloaded
+    if not os.path.exists(os.path.join(output_dir, "main.tf")):
+        shutil.copy(providerTemplate(), os.path.join(output_dir, "main.tf"))
+
+    # If there are any Terraform files other than main.tf, including the root modules of --split,
+    # ask the user for permission to delete them. Incremental and resumed runs update the existing files in place instead.
+    roots_dir = os.path.join(output_dir, "roots")
+    roots = [os.path.join(roots_dir, name) for name in sorted(os.listdir(roots_dir))
+             if os.path.isdir(os.path.join(roots_dir, name))] if os.path.isdir(roots_dir) else []
+    if not args.incremental and not args.resume and not args.check and args.serve == None and len([f for root in [output_dir] + roots for f in os.listdir(root) if os.path.isfile(os.path.join(root, f)) and f.endswith(('.tf', '.tf.json')) and f != "main.tf"]) > 0:
+        user_choice = input(
+            "There are terraform files present in the output directory that aren't main.tf, would you like to remove them? (y/n): ")
+        match user_choice:
+            case "y":
+                for f in os.listdir(output_dir):
+                    if os.path.isfile(os.path.join(output_dir, f)) and f.endswith(('.tf', '.tf.json')) and f != "main.tf":
+                        os.remove(os.path.join(output_dir, f))
+                for root in roots:
+                    # Removing the files of a root with state would destroy its resources on the next apply
+                    if hasState(root):
+                        print(f"Kept {os.path.relpath(root, output_dir)}, it holds Terraform state")
+                    else:
+                        shutil.rmtree(root)
+                try:
+                    cleanup(output_dir)
+                except FileNotFoundError:
+                    pass  # Possibly some but not all tf files existed
+            case "n":
+                print("Exiting...")
+                sys.exit(0)
+            case _:
+                print("Invalid choice, exiting...")
+                sys.exit(1)
+
+    # Providers are installed once and reused by later runs
+    if not args.check:
+        configureProviders(output_dir, args.plugin_cache, args.provider_mirror)
+
+    # Cached API responses live alongside the output, keyed by realm. They are not revalidated
+    # against the org, so the cache is only used when asked for
+    cache = None
+    if args.cache and not args.no_cache:
+        # Incremental runs and drift checks rely on fresh definitions, so always re-fetch
+        cache = ResponseCache(os.path.join(output_dir, ".cache"), args.realm,
+                              args.cache_ttl, args.cache_size * 1024 * 1024, args.refresh or args.incremental or args.check)
+
+    if args.serve != None:
+        from exportServerClass import ExportServer
+        ExportServer(args.api_key, args.realm, output_dir, serve_address[0], serve_address[1], args.serve_workers, args.verbose, args.jobs, args.backend,
+                     args.max_rps, args.concurrency, args.api_url, args.format, args.dedupe_charts, args.serve_token or None)._serve()
+        sys.exit(0)
+
+    # The manifest records what each run exported, for the next incremental run
+    if args.all != None:
+        manifest_root = f"all:{','.join(sorted(all_types))}"
+        if not selection._isEmpty():
+            manifest_root += f" ({selection._key()})"
+    else:
+        manifest_root = args.dashboard or args.group or args.chart or args.slo or args.detector
+    manifest = Manifest(output_dir, manifest_root)
+    # Completed resources are journaled as the run progresses, for --resume
+    journal = None
+    if not args.check:
+        journal = Journal(output_dir, f"{manifest_root} ({args.format})", args.resume)
+
+    # Create a SplunkObservabilityCloud object
+    SplunkCloud = SplunkObservabilityCloud(
+        args.api_key, args.realm, output_dir, args.verbose, args.jobs, args.backend, args.max_rps, args.concurrency, cache, manifest, args.incremental, args.api_url, journal, args.format, args.check, args.dedupe_charts)
+
+    def exportRoots(kind, resource_ids):
+        # Export a batch of resource trees, each output file is written as soon as its resources are imported
+        for resource_id in resource_ids:
+            try:
+                with tracer._span(f"export {kind}", "export", root=resource_id):
+                    exportRoot(kind, resource_id)
+            except requests.HTTPError as e:
+                if args.all == None:
+                    raise
+                print(f"Skipping {kind} {resource_id}: {e}")
+        with tracer._span("flushImports", "export", roots=len(resource_ids)):
+            SplunkCloud._flushImports()
+
+    def postProcessOutput():
+        # Drift checks leave the output untouched
+        if args.check:
+            return
+        with tracer._span("postProcess", "postprocess"):
+            postProcess(output_dir)
+
+    def exportRoot(kind, resource_id):
+        # Build a resource tree, its Terraform imports run at the next _flushImports
+        if kind == "dashboard":
+            from dashboardClass import Dashboard
+            dashboard = Dashboard(resource_id, SplunkCloud)
+            dashboard._setGroup("PLACEHOLDER")
+        elif kind == "dashboardgroup":
+            from dashboardGroupClass import DashboardGroup
+            DashboardGroup(resource_id, SplunkCloud)
+        elif kind == "chart":
+            from chartClass import Chart
+            Chart(SplunkCloud, resource_id, None)
+        elif kind == "slo":
+            from SLOClass import SLO
+            SLO(resource_id, SplunkCloud)
+        elif kind == "detector":
+            from detectorClass import Detector
+            Detector(SplunkCloud, resource_id)
+
+    if args.all != None:
+        # Ids are discovered page by page and exported as they arrive, a group at a time
+        # or a page of detectors or SLOs at a time
+        for kind in [{"groups": "dashboardgroup", "detectors": "detector", "slos": "slo"}[t] for t in all_types]:
+            batch = []
+            # Only the resources matching the filters are fetched in full and imported
+            for resource in selection._select(SplunkCloud, kind):
+                # The list result is the resource itself, so it is not fetched a second time
+                SplunkCloud._remember(f"/v2/{kind}/{resource['id']}", resource)
+                batch.append(resource["id"])
+                if kind == "dashboardgroup" or len(batch) == 100:
+                    exportRoots(kind, batch)
+                    batch = []
+            exportRoots(kind, batch)
+            if not selection._isEmpty():
+                listed, selected = selection._getCounts()
+                print(f"{selected} of {listed} {kind} resources matched the filters")
+        if "groups" in all_types:
+            postProcessOutput()
+    elif args.dashboard:
+        exportRoots("dashboard", [args.dashboard])
+        postProcessOutput()
+    elif args.group:
+        exportRoots("dashboardgroup", [args.group])
+        postProcessOutput()
+    elif args.chart:
+        exportRoots("chart", [args.chart])
+    elif args.slo:
+        exportRoots("slo", [args.slo])
+    elif args.detector:
+        exportRoots("detector", [args.detector])
+
+    if args.check:
+        drift = manifest._drift()
+        for label, key in [("Changed", "changed"), ("Added", "added"), ("Removed", "removed")]:
+            for resource_address, resource_id in drift[key]:
+                print(f"{label}: {resource_address} ({resource_id})")
+        for filename in drift["modified"]:
+            print(f"Modified locally: {filename}")
+        if args.profile != None:
+            tracer._save(args.profile)
+            print(tracer._summary())
+        if any(drift.values()):
+            print(f"Drift detected: {len(drift['changed'])} changed, {len(drift['added'])} added, {len(drift['removed'])} removed, {len(drift['modified'])} files modified locally")
+            sys.exit(1)
+        print("No drift detected")
+        sys.exit(0)
+
+    # Cleanup Functions
+    for filename in SplunkCloud._getPendingOutput():
+        print(f"{filename} was not written, some of its resources could not be exported")
+    if args.split != None:
+        manifest._relocate(splitOutput(output_dir, args.split, manifest._getPreviousFiles()))
+    cleanup(output_dir)
+    manifest._save()
+    journal._finish()
+    # Dashboard exports leave a PLACEHOLDER for their group, for the user to fill in
+    problems = validateFiles(output_dir, args.dashboard != None) if args.validate else 0
+    if args.verbose:
+        stats = SplunkCloud._getAPIStats()
+        print(
+            f"API requests: {stats['requests']}, retries: {stats['retries']}, throttled: {stats['throttled']:.1f}s")
+    if args.profile != None:
+        tracer._save(args.profile)
+        print(tracer._summary())
+        print(f"Trace written to {args.profile}, open it in chrome://tracing or ui.perfetto.dev")
+    print("Terraform files have been created in the terraform_output directory!")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
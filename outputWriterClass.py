@@ -0,0 +1,61 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+
+from helperFunctions import *
+
+
+class OutputWriter:
+    # Writes each output file as soon as every resource that belongs in it is ready,
+    # so only the files still being assembled are held in memory
+    def __init__(self, cwd):
+        self.__cwd = cwd
+        self.__slots = {}
+        self.__blocks = {}
+        self.__lock = threading.Lock()
+
+    def _open(self, filename, resource_addresses) -> None:
+        # Declare the resources of a file, in the order they are written
+        with self.__lock:
+            self.__slots[filename] = list(resource_addresses)
+            self.__blocks.setdefault(filename, {})
+            self.__flush(filename)
+
+    def _write(self, filename, resource_address, terraform) -> None:
+        # Resources can be ready before their file is declared, e.g. when rendered natively
+        with self.__lock:
+            self.__blocks.setdefault(filename, {})[
+                resource_address] = terraform
+            self.__flush(filename)
+
+    def __flush(self, filename) -> None:
+        slots = self.__slots.get(filename)
+        blocks = self.__blocks[filename]
+        if slots == None or any(address not in blocks for address in slots):
+            return
+        if filename.endswith(".json"):
+            content = mergeResourcesJSON(blocks[address] for address in slots)
+        else:
+            content = "".join(blocks[address] for address in slots)
+        with tracer._span("writeFile", "output", file=filename):
+            writeFile(os.path.join(self.__cwd, filename), content)
+        del self.__slots[filename]
+        del self.__blocks[filename]
+
+    def _pending(self) -> list:
+        # Files that are still missing resources
+        with self.__lock:
+            return sorted(self.__blocks)
@@ -0,0 +1,117 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import time
+from datetime import datetime, timezone
+
+# Relative --modified-since durations, e.g. 30m, 12h, 1d, 2w
+duration_units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+class ResourceFilter:
+    # Selection of the resources exported by --all, by name, tags and modification time.
+    # Filters a list endpoint supports are sent as query parameters, and every filter is also
+    # checked against the list results, so only matching resources are fetched in full and imported.
+    # Dashboard groups have no tags, they are selected through the dashboards they contain
+    def __init__(self, name_regex=None, tags=None, modified_since=None):
+        self.__name_regex = name_regex
+        self.__name = re.compile(name_regex) if name_regex != None else None
+        self.__tags = list(dict.fromkeys(tags or []))
+        self.__modified_since = modified_since
+        self.__since = self.__parseSince(
+            modified_since) if modified_since != None else None
+        self.__listed = 0
+        self.__selected = 0
+
+    def __parseSince(self, value) -> int:
+        # Epoch milliseconds, as in the API's lastUpdated
+        duration = re.fullmatch(r'(\d+)([smhdw])', value.strip())
+        if duration != None:
+            seconds = int(duration.group(1)) * duration_units[duration.group(2)]
+            return int((time.time() - seconds) * 1000)
+        try:
+            # Python 3.10 does not accept the Z suffix of UTC dates
+            since = datetime.fromisoformat(re.sub(r'[Zz]$', '+00:00', value.strip()))
+        except ValueError:
+            raise ValueError(
+                f"--modified-since accepts a duration such as 1d or 12h, or an ISO 8601 date, not {value}")
+        if since.tzinfo == None:
+            since = since.replace(tzinfo=timezone.utc)
+        return int(since.timestamp() * 1000)
+
+    def _isEmpty(self) -> bool:
+        return self.__name == None and not self.__tags and self.__since == None
+
+    def _key(self) -> str:
+        # Part of the manifest root, so that differently filtered exports are not compared
+        filters = []
+        if self.__name_regex != None:
+            filters.append(f"name={self.__name_regex}")
+        if self.__tags:
+            filters.append(f"tags={','.join(sorted(self.__tags))}")
+        if self.__modified_since != None:
+            filters.append(f"modified-since={self.__modified_since}")
+        return ";".join(filters)
+
+    def _getCounts(self) -> tuple:
+        return self.__listed, self.__selected
+
+    def __params(self, resource_type) -> dict:
+        # The list endpoints match name as a case-insensitive substring, so only plain names are sent.
+        # A single tag narrows the listing down whether the API matches any or all of several.
+        # They take no modification time, --modified-since is only checked against the list results
+        params = {}
+        if resource_type in ["dashboardgroup", "detector"] and self.__name_regex != None and re.fullmatch(r'[\w ]+', self.__name_regex):
+            params["name"] = self.__name_regex
+        if resource_type in ["dashboard", "detector"] and self.__tags:
+            params["tags"] = self.__tags[0]
+        return params
+
+    def __matches(self, resource, name=True) -> bool:
+        if name and self.__name != None and not self.__name.search(resource.get("name") or ""):
+            return False
+        if any(tag not in (resource.get("tags") or []) for tag in self.__tags):
+            return False
+        if self.__since != None and (resource.get("lastUpdated") or 0) < self.__since:
+            return False
+        return True
+
+    def __matchingGroups(self, soc) -> set:
+        # Groups holding a dashboard that has the tags and was modified since, from the dashboard listing
+        groups = set()
+        for dashboard in soc._listResources("dashboard", self.__params("dashboard")):
+            if self.__matches(dashboard, name=False):
+                groups.add(dashboard.get("groupId"))
+        return groups
+
+    def _select(self, soc, resource_type):
+        # The list results of resource_type that match, page by page
+        self.__listed = 0
+        self.__selected = 0
+        groups = None
+        if resource_type == "dashboardgroup" and (self.__tags or self.__since != None):
+            groups = self.__matchingGroups(soc)
+        for resource in soc._listResources(resource_type, self.__params(resource_type)):
+            self.__listed += 1
+            if groups != None:
+                if self.__name != None and not self.__name.search(resource.get("name") or ""):
+                    continue
+                # A group modified since is selected by its own lastUpdated too, unless tags are required
+                if resource["id"] not in groups and (self.__tags or not self.__matches(resource)):
+                    continue
+            elif not self.__matches(resource):
+                continue
+            self.__selected += 1
+            yield resource
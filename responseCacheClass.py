@@ -0,0 +1,99 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import re
+import threading
+import time
+
+
+class ResponseCache:
+    # On-disk cache of API responses, keyed by realm, resource type and id.
+    # Entries are trusted while younger than the TTL, whatever happened to the resource in the org
+    # meanwhile, and the least recently used entries are evicted past max_bytes.
+    def __init__(self, directory, realm, ttl=3600, max_bytes=256 * 1024 * 1024, refresh=False):
+        self.__directory = os.path.join(directory, realm)
+        self.__ttl = ttl
+        self.__max_bytes = max_bytes
+        self.__refresh = refresh
+        self.__size = None
+        self.__lock = threading.Lock()
+
+    def __path(self, resource_type, resource_id) -> str:
+        resource_id = re.sub(r'[^\w-]', '_', resource_id)
+        return os.path.join(self.__directory, resource_type, f"{resource_id}.json")
+
+    def _get(self, resource_type, resource_id):
+        if self.__refresh:
+            return None
+        path = self.__path(resource_type, resource_id)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if time.time() - entry.get("fetched", 0) > self.__ttl:
+            return None
+        try:
+            # Access time drives the LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry["data"]
+
+    def _put(self, resource_type, resource_id, data) -> None:
+        path = self.__path(resource_type, resource_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"fetched": time.time(), "data": data}
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(entry, f)
+        with self.__lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temporary, path)
+            if self.__size == None:
+                self.__size = self.__scanSize()
+            else:
+                self.__size += os.path.getsize(path) - previous
+            if self.__size > self.__max_bytes:
+                self.__evict()
+
+    def __entries(self) -> list:
+        entries = []
+        for root, _, files in os.walk(self.__directory):
+            for filename in files:
+                if filename.endswith(".json"):
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def __scanSize(self) -> int:
+        return sum(size for _, size, _ in self.__entries())
+
+    def __evict(self) -> None:
+        # Drop the least recently used entries until comfortably under the cap
+        target = self.__max_bytes * 0.9
+        for _, size, path in sorted(self.__entries()):
+            if self.__size <= target:
+                break
+            try:
+                os.remove(path)
+                self.__size -= size
+            except FileNotFoundError:
+                pass
@@ -12,13 +12,49 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from helperFunctions import *
+from apiClientClass import APIClient
+from bulkImportClass import BulkImport
+from hclRenderer import renderResource
+from outputWriterClass import OutputWriter
+from workerPoolClass import WorkerPool
+
+
 class SplunkObservabilityCloud:
-    def __init__(self, token, realm, cwd, verbose=False):
+    def __init__(self, token, realm, cwd, verbose=False, jobs=1, backend="import", max_rps=None, concurrency=8, cache=None, manifest=None, incremental=False, api_url=None, journal=None, output_format="hcl", check=False, dedupe_charts=False, client=None):
         self.__token = token
         self.__realm = realm
         self.__cwd = cwd
-        self.__fuse = False
         self.__verbose = verbose
+        self.__jobs = max(1, jobs)
+        self.__pool = None
+        self.__manifest = manifest
+        self.__incremental = incremental
+        self.__journal = journal
+        self.__format = output_format
+        self.__check = check
+        self.__dedupe = dedupe_charts
+        self.__fingerprints = {}
+        self.__canonical = {}
+        self.__backend = backend
+        self.__bulk = BulkImport(self) if backend == "bulk" else None
+        self.__concurrency = max(1, concurrency)
+        self.__prefetched = {}
+        self.__consumed = set()
+        self.__registry = {}
+        self.__owners = {}
+        self.__names = set()
+        self.__writer = OutputWriter(cwd)
+        self.__cache = cache
+        # A long-running --serve daemon shares one client, and its keep-alive connections, between exports
+        self.__client = client or APIClient(
+            token, realm, max_rps, pool_size=max(10, self.__jobs * 2, self.__concurrency), base_url=api_url)
+        self.__lock = threading.Lock()
+        self.__pool_lock = threading.Lock()
 
     def _getRealm(self) -> str:
         return self.__realm
@@ -29,13 +65,202 @@ class SplunkObservabilityCloud:
     def _getCWD(self) -> str:
         return self.__cwd
 
-    def _getFuse(self) -> bool:
-        # Fuse boolean - Used to determine if the local Terraform state has been initialized
-        if self.__fuse:
-            return True
-        else:
-            self.__fuse = True
-            return False
-
     def _getVerbose(self) -> bool:
         return self.__verbose
+
+    def _getJobs(self) -> int:
+        return self.__jobs
+
+    def _getJournal(self):
+        return self.__journal
+
+    def _getFormat(self) -> str:
+        return self.__format
+
+    def __outputName(self, filename) -> str:
+        # Resource classes name their files <name>.tf, JSON syntax files are <name>.tf.json
+        return f"{filename}.json" if self.__format == "json" else filename
+
+    def _apiGet(self, path, params=None):
+        # All API traffic goes through the shared, pooled client
+        if params == None:
+            with self.__lock:
+                if path in self.__prefetched:
+                    self.__consumed.add(path)
+                    return self.__prefetched.pop(path)
+        return self.__fetch(path, params)
+
+    def __fetch(self, path, params=None):
+        # Single resources (/v2/<type>/<id>) are served from the response cache when possible.
+        # Groups and dashboards decide which dashboards and charts are exported, so they are always
+        # fetched fresh: a chart added within the TTL would otherwise be dropped as an orphan
+        resource = re.fullmatch(r'/v2/(\w+)/([\w-]+)', path)
+        if self.__cache == None or params != None or resource == None or resource.group(1) in ["dashboardgroup", "dashboard"]:
+            return self.__client._get(path, params)
+        data = self.__cache._get(resource.group(1), resource.group(2))
+        if data == None:
+            data = self.__client._get(path)
+            self.__cache._put(resource.group(1), resource.group(2), data)
+        return data
+
+    def _listResources(self, resource_type, params=None, page_size=100):
+        # Walk a paginated list endpoint (e.g. /v2/detector), one page in memory at a time
+        offset = 0
+        while True:
+            page = self.__client._get(f"/v2/{resource_type}", dict(
+                params or {}, offset=offset, limit=page_size))
+            results = page.get("results") or []
+            for result in results:
+                yield result
+            offset += len(results)
+            # Without a count the total is unknown, so paging stops at the first short page
+            if len(results) < page_size or offset >= page.get("count", float("inf")):
+                return
+
+    def _remember(self, path, data) -> None:
+        # Serve the next _apiGet of path from data already at hand, e.g. a list result
+        with self.__lock:
+            self.__prefetched[path] = data
+
+    def _prefetch(self, paths) -> None:
+        # Fetch resources concurrently so that the matching _apiGet calls are served from memory
+        # Paths already served are skipped, e.g. a chart shared with a dashboard built earlier
+        with self.__lock:
+            paths = [path for path in dict.fromkeys(paths)
+                     if path not in self.__prefetched and path not in self.__consumed]
+        if not paths:
+            return
+        with ThreadPoolExecutor(max_workers=self.__concurrency) as executor:
+            futures = {path: executor.submit(
+                self.__fetch, path) for path in paths}
+        for path, future in futures.items():
+            # Failures are left for the resource's own fetch to report
+            if future.exception() == None:
+                with self.__lock:
+                    self.__prefetched[path] = future.result()
+
+    def _getAPIStats(self) -> dict:
+        return self.__client._getStats()
+
+    def _getBackend(self) -> str:
+        return self.__backend
+
+    def _getResource(self, resource_type, resource_id, factory):
+        # Identity map - each resource is fetched and imported at most once per run,
+        # later lookups (from any thread) get the object built by the first one
+        key = (resource_type, resource_id)
+        with self.__lock:
+            future = self.__registry.get(key)
+            owner = future == None
+            if owner:
+                future = Future()
+                self.__registry[key] = future
+        if owner:
+            try:
+                future.set_result(factory())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def _uniqueName(self, resource_type, name, filename) -> str:
+        # Resource addresses and output files must be unique across the whole run,
+        # so a clashing name gets a numeric suffix ("Overview", "Overview1", ...)
+        with self.__lock:
+            candidate = name
+            count = 0
+            while (resource_type, setTfName(candidate)) in self.__names or filename(candidate) in self.__names:
+                count += 1
+                candidate = f"{name}{count}"
+            self.__names.add((resource_type, setTfName(candidate)))
+            self.__names.add(filename(candidate))
+            return candidate
+
+    def _claim(self, resource_type, resource_id, claimant):
+        # The first claimant of a resource owns it, e.g. the dashboard whose file a shared chart is written to
+        with self.__lock:
+            return self.__owners.setdefault((resource_type, resource_id), claimant)
+
+    def _canonicalChart(self, chart_id) -> str:
+        # With --dedupe-charts, charts with identical definitions are all exported as the first one
+        # claimed. Fingerprints come from the prefetched API responses, in claim order
+        if not self.__dedupe:
+            return chart_id
+        path = f"/v2/chart/{chart_id}"
+        with self.__lock:
+            if chart_id not in self.__canonical:
+                data = self.__prefetched.get(path)
+                canonical = chart_id
+                if data != None:
+                    definition = {key: value for key, value in data.items()
+                                  if key != "id"}
+                    canonical = self.__fingerprints.setdefault(
+                        definitionHash(definition), chart_id)
+                    if canonical != chart_id:
+                        # The duplicate itself is never built
+                        del self.__prefetched[path]
+                        self.__consumed.add(path)
+                self.__canonical[chart_id] = canonical
+            return self.__canonical[chart_id]
+
+    def _openOutput(self, filename, resource_addresses) -> None:
+        # Declare which resources make up an output file, in order
+        self.__writer._open(self.__outputName(filename), resource_addresses)
+
+    def _writeOutput(self, filename, resource_address, resource_id, data, terraform) -> None:
+        # Hand a finished resource to its output file, noting it for later incremental runs
+        filename = self.__outputName(filename)
+        if self.__manifest != None:
+            self.__manifest._record(
+                resource_address, resource_id, data, filename, terraform)
+        if self.__journal != None:
+            self.__journal._record(
+                resource_address, resource_id, filename, terraform)
+        self.__writer._write(filename, resource_address, terraform)
+
+    def _getPendingOutput(self) -> list:
+        return self.__writer._pending()
+
+    def _importResource(self, resource_address, resource_id, callback, data=None, exclude=(), references=None) -> None:
+        # Import a resource and pass its Terraform code, without the excluded attributes, to callback.
+        # Terraform imports are deferred until _flushImports
+        if self.__check:
+            # Drift check, only the API definition is compared and nothing is imported or written
+            self.__manifest._compare(resource_address, resource_id, data)
+            return
+        if self.__journal != None:
+            completed = self.__journal._completed(resource_address, resource_id)
+            if completed != None:
+                # Finished before the run was interrupted
+                callback(completed)
+                return
+        if self.__manifest != None and self.__incremental:
+            previous = self.__manifest._previous(
+                resource_address, data, self.__format, references)
+            if previous != None:
+                # Unchanged since the last run
+                callback(previous)
+                return
+        if self.__backend == "native":
+            # Rendered in-process from the API response, no Terraform required
+            with tracer._span("renderResource", "postprocess", type=resource_address.split(".")[0], id=resource_id):
+                terraform = renderResource(
+                    resource_address, data, exclude, self.__format)
+            callback(terraform)
+            return
+        if self.__backend == "bulk":
+            self.__bulk._register(
+                resource_address, resource_id, callback, exclude)
+            return
+        if self.__pool == None:
+            # Creating the pool runs terraform init, so only the threads waiting for it are held up
+            with self.__pool_lock:
+                if self.__pool == None:
+                    self.__pool = WorkerPool(self, self.__jobs)
+        self.__pool._register(resource_address, resource_id, callback, exclude)
+
+    def _flushImports(self) -> None:
+        # Run the imports collected so far
+        if self.__bulk != None:
+            self.__bulk._run()
+        if self.__pool != None:
+            self.__pool._run()
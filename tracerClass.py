@@ -0,0 +1,96 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+class Tracer:
+    # Timing spans for API calls, Terraform launches and post-processing, written as a
+    # Chrome trace (chrome://tracing, ui.perfetto.dev) when --profile is given
+    def __init__(self):
+        self.__enabled = False
+        self.__events = []
+        self.__origin = time.perf_counter()
+        self.__lock = threading.Lock()
+
+    def _enable(self) -> None:
+        self.__enabled = True
+        self.__origin = time.perf_counter()
+
+    def _isEnabled(self) -> bool:
+        return self.__enabled
+
+    @contextlib.contextmanager
+    def _span(self, name, category, **tags):
+        # Tags such as type and id attribute the span to a resource in the summary
+        if not self.__enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = {"name": name, "cat": category, "ph": "X", "pid": os.getpid(),
+                     "tid": threading.get_native_id(),
+                     "ts": round((start - self.__origin) * 1e6),
+                     "dur": round((end - start) * 1e6),
+                     "args": {key: value for key, value in tags.items() if value != None}}
+            with self.__lock:
+                self.__events.append(event)
+
+    def _save(self, path) -> None:
+        with self.__lock:
+            events = list(self.__events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def _summary(self, limit=10) -> str:
+        with self.__lock:
+            events = list(self.__events)
+        phases = {}
+        resources = {}
+        for event in events:
+            seconds = event["dur"] / 1e6
+            count, total, slowest = phases.get(event["name"], (0, 0.0, 0.0))
+            phases[event["name"]] = (
+                count + 1, total + seconds, max(slowest, seconds))
+            # Only the innermost spans are tagged with an id, so time is not counted twice.
+            # The API type (chart) is replaced by the Terraform type (signalfx_time_chart) once known
+            resource_id = event["args"].get("id")
+            if resource_id != None:
+                resource_type, count, total = resources.get(
+                    resource_id, (None, 0, 0.0))
+                if resource_type == None or event["args"].get("type", "").startswith("signalfx_"):
+                    resource_type = event["args"].get("type")
+                resources[resource_id] = (
+                    resource_type, count + 1, total + seconds)
+
+        lines = [f"{'Phase':<40} {'Calls':>7} {'Total s':>9} {'Max s':>8}"]
+        for name, (count, total, slowest) in sorted(phases.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<40} {count:>7} {total:>9.3f} {slowest:>8.3f}")
+        lines.append("")
+        lines.append(f"{'Slowest resources':<51} {'Spans':>7} {'Total s':>9}")
+        for resource_id, (resource_type, count, total) in sorted(resources.items(), key=lambda item: -item[1][2])[:limit]:
+            name = f"{resource_type} {resource_id}"
+            lines.append(f"{name:<51} {count:>7} {total:>9.3f}")
+        return "\n".join(lines)
+
+
+# Shared by the helper functions, the API client and the resource classes
+tracer = Tracer()
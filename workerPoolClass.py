@@ -0,0 +1,120 @@
+# Copyright 2024 Sean Kunkler
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from helperFunctions import *
+from hclRenderer import renderState, stateResources
+
+
+class WorkerPool:
+    # Each worker owns a scratch working directory (shard) with its own state file,
+    # so parallel imports never contend for the same state lock. Imports are collected
+    # and run together, and each shard's state is then read back with one `terraform show -json`.
+    def __init__(self, SOC, jobs):
+        self.__soc = SOC
+        self.__root = os.path.join(self.__soc._getCWD(), ".shards")
+        self.__imports = {}
+        self.__leftovers = {}
+        self.__lock = threading.Lock()
+        # Providers are only downloaded once, into the output directory
+        terraformInit(self.__soc._getCWD(),
+                      self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
+        journal = self.__soc._getJournal()
+        if journal != None and journal._isResuming():
+            self.__recoverShards()
+        self.__shards = [self.__createShard(i) for i in range(jobs)]
+
+    def __recoverShards(self) -> None:
+        # Resources imported by an interrupted run, but not yet read back, are still in its shards' state
+        if not os.path.isdir(self.__root):
+            return
+        for shard in sorted(os.listdir(self.__root)):
+            if os.path.exists(os.path.join(self.__root, shard, "terraform.tfstate")):
+                self.__leftovers.update(stateResources(terraformShow(
+                    os.path.join(self.__root, shard), verbose=self.__soc._getVerbose())))
+        if self.__leftovers:
+            print(f"Recovered {len(self.__leftovers)} imports from the interrupted run")
+
+    def __createShard(self, index) -> str:
+        shard = os.path.join(self.__root, f"shard-{index}")
+        linkWorkspace(self.__soc._getCWD(), shard)
+        return shard
+
+    def _register(self, resource_address, resource_id, callback, exclude=()):
+        with self.__lock:
+            if resource_address not in self.__imports:
+                self.__imports[resource_address] = (resource_id, exclude, [])
+            self.__imports[resource_address][2].append(callback)
+
+    def __importShard(self, shard, imports, pending) -> dict:
+        # Import whatever is left in the queue into this shard's state, then read it all back at once
+        with open(os.path.join(shard, "resource.tf"), "w") as f:
+            for resource_address in imports:
+                resource_type, resource_name = resource_address.split(".", 1)
+                f.write(
+                    f"resource \"{resource_type}\" \"{resource_name}\" {{\n")
+                f.write(f"}}\n")
+        for state_file in ["terraform.tfstate", "terraform.tfstate.backup"]:
+            try:
+                os.remove(os.path.join(shard, state_file))
+            except FileNotFoundError:
+                pass
+        imported = False
+        while True:
+            try:
+                resource_address = pending.get_nowait()
+            except queue.Empty:
+                break
+            terraformImport(resource_address, imports[resource_address][0], shard,
+                            self.__soc._getAPIKey(), self.__soc._getRealm(), self.__soc._getVerbose())
+            imported = True
+        if not imported:
+            return {}
+        return stateResources(terraformShow(shard, verbose=self.__soc._getVerbose()))
+
+    def _run(self):
+        with self.__lock:
+            imports = self.__imports
+            self.__imports = {}
+        if not imports:
+            return
+        resources = {}
+        pending = queue.Queue()
+        for resource_address, (resource_id, _, _) in imports.items():
+            leftover = self.__leftovers.pop(resource_address, None)
+            if leftover != None and leftover.get("id") == resource_id:
+                resources[resource_address] = leftover
+            else:
+                pending.put(resource_address)
+        with ThreadPoolExecutor(max_workers=len(self.__shards)) as executor:
+            states = list(executor.map(lambda shard: self.__importShard(
+                shard, imports, pending), self.__shards))
+        for state in states:
+            resources.update(state)
+        for resource_address, (resource_id, exclude, callbacks) in imports.items():
+            if resource_address in resources:
+                with tracer._span("renderState", "postprocess", type=resource_address.split(".")[0], id=resource_id):
+                    terraform = renderState(
+                        resource_address, resources[resource_address], exclude, self.__soc._getFormat())
+            else:
+                if self.__soc._getVerbose():
+                    print(
+                        f"No state was imported for {resource_address} ({resource_id})")
+                terraform = ""
+            for callback in callbacks:
+                callback(terraform)